@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import AuthState
+
+TOKEN_VERSION_CLAIM = 'tv'
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with ``email`` + ``password`` in one indexed query."""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = User.objects.filter(email=email).first()
+        if user is None:
+            # ✅ Run the hasher anyway so response time doesn't reveal unknown emails
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+def tokens_for_user(user):
+    """Refresh/access pair carrying the claims :class:`CachedJWTAuthentication` needs."""
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['is_staff'] = user.is_staff
+    refresh[TOKEN_VERSION_CLAIM] = AuthState.objects.filter(user_id=user.id).values_list('token_version', flat=True).first() or 0
+    return refresh
+
+
+def _cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def _state_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def user_state(user_id):
+    """``{'is_active', 'is_staff', 'token_version'}`` for a user id, cached for ``AUTH_USER_CACHE_TTL``.
+
+    Unknown users come back inactive.
+    """
+    cache = _cache()
+    state = cache.get(_state_key(user_id))
+    if state is None:
+        row = User.objects.filter(id=user_id).values(
+            'is_active', 'is_staff', token_version=F('auth_state__token_version'),
+        ).first()
+        state = row or {'is_active': False, 'is_staff': False, 'token_version': None}
+        state['token_version'] = state['token_version'] or 0
+        cache.set(_state_key(user_id), state, settings.AUTH_USER_CACHE_TTL)
+    return state
+
+
+def forget_user(user_id):
+    """Drop the cached state so the next request re-reads the user row."""
+    _cache().delete(_state_key(user_id))
+
+
+def revoke_user_tokens(user_id):
+    """Reject every token issued to the user up to now (logout everywhere, password change).
+
+    The version is stored in the database, so every worker sees it once its
+    cached state expires (at once on this worker's cache).
+    """
+    AuthState.objects.get_or_create(user_id=user_id)
+    AuthState.objects.filter(user_id=user_id).update(token_version=F('token_version') + 1)
+    forget_user(user_id)
+
+
+class ClaimsUser(TokenUser):
+    """A user built from token claims; no database row is loaded."""
+
+    def __init__(self, token, is_staff):
+        super().__init__(token)
+        self.__dict__['is_staff'] = is_staff
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that returns a :class:`ClaimsUser` instead of loading ``User``.
+
+    Active/staff flags and token versions come from a short-TTL cache, so the
+    hot path issues no auth query; a deactivated or demoted user is cut off
+    within ``AUTH_USER_CACHE_TTL`` (immediately on this cache when the user
+    row is saved).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        state = user_state(user_id)
+        if not state['is_active']:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != state.get('token_version', 0):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        # ✅ Staff needs both the signed claim and the current user row
+        return ClaimsUser(validated_token, is_staff=bool(validated_token.get('is_staff')) and state['is_staff'])
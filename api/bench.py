@@ -0,0 +1,185 @@
+"""Helpers shared by the ``bench_*`` management commands."""
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+import django
+import fitz  # PyMuPDF for generating the synthetic corpus
+from django.conf import settings
+from django.db import connection, connections
+
+
+def make_pdf(num_pages, salt=''):
+    """A synthetic PDF with ``num_pages`` text pages; ``salt`` makes the bytes unique."""
+    doc = fitz.open()
+    for number in range(num_pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Benchmark page {number + 1} of {num_pages} {salt}")
+        page.insert_text((72, 100), "Lorem ipsum dolor sit amet, " * 8)
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def current_rss_kb():
+    """Resident set size of this process right now, in KiB (None where ``/proc`` isn't available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RSSSampler:
+    """Peak RSS growth while the block runs, sampled every ``interval`` seconds.
+
+    ``ru_maxrss`` is a high-water mark for the whole process, so once one
+    run peaks every later run reports the same number. Sampling the
+    current RSS instead gives each run its own peak above where it started
+    (memory the process already holds and reuses doesn't count).
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start_kb = self.peak_kb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._record()
+
+    def _record(self):
+        rss = current_rss_kb()
+        if rss is not None:
+            self.peak_kb = max(self.peak_kb or 0, rss)
+
+    def __enter__(self):
+        gc.collect()
+        self.start_kb = self.peak_kb = current_rss_kb()
+        if self.start_kb is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread.is_alive():
+            self._stop.set()
+            self._thread.join()
+            self._record()
+        return False
+
+    @property
+    def growth_kb(self):
+        return None if self.start_kb is None else self.peak_kb - self.start_kb
+
+
+def format_mib(kb):
+    return '-' if kb is None else f"{kb / 1024:.1f}"
+
+
+def run_concurrent(tasks, concurrency, make_context=None):
+    """Run ``tasks`` (callables taking a per-thread context) on ``concurrency`` threads.
+
+    Returns ``(latencies_seconds, outcomes, wall_seconds)`` where outcomes
+    are whatever each task returned (e.g. an HTTP status code).
+    """
+    latencies = []
+    outcomes = []
+    lock = threading.Lock()
+    index = iter(range(len(tasks)))
+
+    def worker():
+        context = make_context() if make_context else None
+        try:
+            while True:
+                with lock:
+                    i = next(index, None)
+                if i is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    outcome = tasks[i](context)
+                except Exception as e:
+                    outcome = type(e).__name__
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    outcomes.append(outcome)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes, time.perf_counter() - started
+
+
+def summarize(latencies, wall_seconds, memory=None):
+    """Latency percentiles and throughput, plus RSS growth if ``memory`` (an :class:`RSSSampler`) is given."""
+    ordered = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(ordered),
+        'throughput_rps': round(len(ordered) / wall_seconds, 2) if wall_seconds else None,
+        'p50_ms': to_ms(percentile(ordered, 50)),
+        'p95_ms': to_ms(percentile(ordered, 95)),
+        'p99_ms': to_ms(percentile(ordered, 99)),
+        'max_ms': to_ms(ordered[-1] if ordered else None),
+        'rss_start_kb': memory.start_kb if memory else None,
+        'rss_growth_kb': memory.growth_kb if memory else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Options every management command has; not worth recording with results
+_COMMON_OPTIONS = {'verbosity', 'settings', 'pythonpath', 'traceback', 'no_color', 'force_color', 'skip_checks'}
+
+
+def run_metadata(**options):
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'options': {key: value for key, value in options.items() if key not in _COMMON_OPTIONS},
+    }
+
+
+def write_results(path, payload):
+    """Write a benchmark run as JSON; defaults to ``bench-results/<name>-<commit>-<time>.json``."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    return path
+
+
+def default_results_path(name):
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return os.path.join(settings.BASE_DIR, 'bench-results', f"{name}-{git_commit() or 'nogit'}-{stamp}.json")
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """One client's view of a channel; ``get`` waits for the next event."""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        # ✅ A slow client loses its oldest events rather than growing without bound
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Next event, or ``asyncio.TimeoutError`` after ``timeout`` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fans events out to subscribers in this process.
+
+    ``publish`` is safe to call from sync views and worker threads; events
+    are handed to each subscriber's event loop. Only streams served by the
+    publishing process see an event, so with more than one process (several
+    ASGI workers, or ``process_uploads`` running apart from the web server)
+    use ``RedisBroker``.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, settings.EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Event loop already closed; the stream is going away
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(InProcessBroker):
+    """Relays events through Redis pub/sub so streams in every process see them.
+
+    Each process holds one pub/sub connection, subscribed to the channels its
+    own clients are streaming; a listener thread hands incoming events to the
+    local subscribers.
+    """
+
+    def __init__(self, url=None):
+        import redis
+
+        super().__init__()
+        self._redis = redis.Redis.from_url(url or settings.ORDER_EVENT_REDIS_URL)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._channels_lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, channel):
+        with self._channels_lock:
+            subscription = super().subscribe(channel)
+            self._pubsub.subscribe(**{channel: self._relay})
+            if self._listener is None:
+                self._listener = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._channels_lock:
+            super().unsubscribe(subscription)
+            if subscription.channel not in self._subscribers:
+                self._pubsub.unsubscribe(subscription.channel)
+
+    def publish(self, channel, event):
+        self._redis.publish(channel, json.dumps(event))
+
+    def _relay(self, message):
+        super().publish(message['channel'].decode(), json.loads(message['data']))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Return the broker configured by ``ORDER_EVENT_BROKER``."""
+    return import_string(settings.ORDER_EVENT_BROKER)()
+
+
+def order_event(order_id, user_id, store_id, status, previous_status=None):
+    return {
+        'type': 'order.status',
+        'order_id': order_id,
+        'user_id': user_id,
+        'store_id': store_id,
+        'status': status,
+        'previous_status': previous_status,
+        'at': timezone.now().isoformat(),
+    }
+
+
+def publish_order_events(events):
+    """Publish order events to the owner's and the store's channel once the transaction commits."""
+    events = list(events)
+    if not events:
+        return
+
+    def send():
+        broker = get_broker()
+        for event in events:
+            broker.publish(f"user:{event['user_id']}", event)
+            if event['store_id']:
+                broker.publish(f"store:{event['store_id']}", event)
+
+    transaction.on_commit(send)
+
+
+def publish_status_change(orders, status, previous_status=None):
+    """Publish a transition applied with ``QuerySet.update`` (which sends no signals).
+
+    ``previous_status`` is one status for every order, or ``{order_id: status}``.
+    """
+    previous = previous_status if isinstance(previous_status, dict) else None
+    publish_order_events(
+        order_event(
+            order.id, order.user_id, order.store_id, status,
+            previous[order.id] if previous is not None else previous_status,
+        )
+        for order in orders
+    )
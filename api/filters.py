@@ -0,0 +1,55 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+ORDER_STATUSES = {'processing', 'pending', 'printing', 'completed', 'failed'}
+
+
+def _parse_moment(name, value, end_of_day=False):
+    """Accept an ISO date or datetime; a bare ``until`` date covers that whole day."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: f"Invalid date: {value}"})
+        if end_of_day:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_orders(queryset, params):
+    """Apply the ``status``, ``store``, ``since`` and ``until`` query filters."""
+    statuses = params.get('status')
+    if statuses:
+        statuses = statuses.split(',')
+        unknown = set(statuses) - ORDER_STATUSES
+        if unknown:
+            raise ValidationError({'status': f"Unknown status: {', '.join(sorted(unknown))}"})
+        queryset = queryset.filter(status__in=statuses)
+
+    store_id = params.get('store')
+    if store_id:
+        if not store_id.isdigit():
+            raise ValidationError({'store': "Store must be an id"})
+        queryset = queryset.filter(store_id=int(store_id))
+
+    since = params.get('since')
+    if since:
+        queryset = queryset.filter(uploaded_at__gte=_parse_moment('since', since))
+
+    until = params.get('until')
+    if until:
+        queryset = queryset.filter(uploaded_at__lt=_parse_moment('until', until, end_of_day=True))
+
+    return queryset
+
+
+def includes_archived(params):
+    """Whether the filters can match archived orders (they are all ``completed``)."""
+    statuses = params.get('status')
+    return not statuses or 'completed' in statuses.split(',')
@@ -0,0 +1,135 @@
+"""In-memory spatial index of store coordinates.
+
+Stores are points on the unit sphere in a 3-d k-d tree: straight-line
+(chord) distance between unit vectors orders points exactly like
+great-circle distance, so a plain Euclidean k-nearest search is correct
+everywhere, including across the antimeridian and near the poles. The tree
+is rebuilt whenever the store directory version changes (see
+:mod:`api.stores`), so it is never queried against stale coordinates.
+"""
+import heapq
+import math
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Store
+from .queue_stats import queue_snapshots
+from .routers import reading_from
+from .serializers import StoreSerializer
+from .stores import current_version
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vector(lat, lng):
+    lat, lng = math.radians(lat), math.radians(lng)
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+class KDTree:
+    """Static 3-d tree over ``(point, store_id)`` pairs; nodes are ``(point, store_id, axis, left, right)``."""
+
+    def __init__(self, points):
+        self.size = len(points)
+        self.root = self._build(list(points), 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        middle = len(points) // 2
+        point, store_id = points[middle]
+        return (point, store_id, axis, self._build(points[:middle], depth + 1), self._build(points[middle + 1:], depth + 1))
+
+    def nearest(self, target, k, max_distance=math.inf):
+        """Up to ``k`` ``(distance, store_id)`` pairs nearest ``target``, closest first."""
+        best = []  # max-heap of (-distance², store_id)
+        bound = max_distance * max_distance
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            point, store_id, axis, left, right = node
+            distance = sum((a - b) ** 2 for a, b in zip(point, target))
+            if distance <= bound:
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, store_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, store_id))
+                if len(best) == k:
+                    bound = min(bound, -best[0][0])
+            offset = target[axis] - point[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            # ✅ Far side pushed first, popped last: only visited if the splitting plane is within the bound
+            if offset * offset <= bound:
+                stack.append(far)
+            stack.append(near)
+        return [(math.sqrt(-distance), store_id) for distance, store_id in sorted(best, reverse=True)]
+
+
+_index = (None, None, None)  # (store directory version, KDTree, {store_id: serialized store})
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """``(tree, stores)`` for the current store directory, rebuilt after any store change."""
+    global _index
+    version = current_version()
+    if _index[0] != version:
+        with _index_lock:
+            if _index[0] != version:
+                located = Store.objects.filter(latitude__isnull=False, longitude__isnull=False).order_by('id')
+                with reading_from(DEFAULT_DB_ALIAS):  # ✅ Kept until the next version change, so load it from the primary
+                    stores = {store['id']: dict(store) for store in StoreSerializer(located, many=True).data}
+                tree = KDTree([
+                    (to_unit_vector(store['latitude'], store['longitude']), store_id)
+                    for store_id, store in stores.items()
+                ])
+                _index = (version, tree, stores)
+    _, tree, stores = _index  # ✅ One read: a concurrent rebuild can't pair an old tree with new stores
+    return tree, stores
+
+
+def nearest_stores(lat, lng, k, radius_km=None):
+    """Up to ``k`` ``(distance_km, store)`` pairs, nearest first."""
+    tree, stores = get_index()
+    max_chord = km_to_chord(radius_km) if radius_km is not None else math.inf
+    return [
+        (chord_to_km(chord), stores[store_id])
+        for chord, store_id in tree.nearest(to_unit_vector(lat, lng), k, max_chord)
+    ]
+
+
+def ranked_stores(lat, lng, k, radius_km=None):
+    """The ``k`` best stores near a point, by distance plus queue load.
+
+    The ``NEAREST_STORES_CANDIDATES`` nearest stores are scored as
+    ``distance_km + queued pages * NEAREST_STORES_KM_PER_PAGE``, so a
+    slightly farther idle store beats a busy one next door.
+    """
+    candidates = nearest_stores(lat, lng, max(k, settings.NEAREST_STORES_CANDIDATES), radius_km)
+    snapshots = queue_snapshots([store['id'] for _, store in candidates])
+    ranked = []
+    for distance, store in candidates:
+        queue = snapshots.get(store['id'])
+        load = queue['pending_pages'] + queue['printing_pages'] if queue else 0
+        ranked.append({
+            **store,
+            'distance_km': round(distance, 3),
+            'queue': queue,
+            'score': round(distance + load * settings.NEAREST_STORES_KM_PER_PAGE, 3),
+        })
+    ranked.sort(key=lambda store: (store['score'], store['distance_km']))
+    return ranked[:k]
@@ -0,0 +1,110 @@
+"""``Idempotency-Key`` support for endpoints clients retry (``upload_file``).
+
+Keys live in :class:`~api.models.IdempotencyRecord`, unique per
+``(user, scope, key)``, so every worker sees them and nothing is evicted
+early. The first request inserts the record (an in-flight claim that can
+be taken over after ``IDEMPOTENCY_LOCK_SECONDS`` if its worker dies),
+runs, and stores its successful response for ``IDEMPOTENCY_TTL``.
+Retries with the same key get that response back without redoing any
+work; retries arriving while it is still running wait for it. Reusing a
+key for a different request is a 422. Failed requests release the key, so
+the client can retry them.
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(*parts):
+    """Digest of everything that makes two requests "the same request"."""
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _mismatch():
+    return Response(
+        {'error': 'Idempotency-Key was already used for a different request'},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
+def _replay(record):
+    response = Response(record.response_data, status=record.response_status)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def _claim(scope, user_id, key, request_fingerprint):
+    """``(record, owned)``: insert the key, or take over an expired/abandoned one. ``record`` is None if it just vanished."""
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    claim = {'fingerprint': request_fingerprint, 'locked_until': locked_until, 'expires_at': locked_until}
+    try:
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(user_id=user_id, scope=scope, key=key, **claim), True
+    except IntegrityError:
+        pass  # ✅ Unique (user, scope, key): someone else holds it
+
+    record = IdempotencyRecord.objects.filter(user_id=user_id, scope=scope, key=key).first()
+    if record is None:
+        return None, False
+    stale = Q(state='done', expires_at__lt=now) | Q(state='in_flight', locked_until__lt=now)
+    taken_over = IdempotencyRecord.objects.filter(stale, id=record.id).update(
+        state='in_flight', response_status=None, response_data=None, **claim,
+    )
+    if taken_over:
+        record.locked_until = locked_until
+    return record, bool(taken_over)
+
+
+def run_idempotent(scope, user_id, key, request_fingerprint, handler):
+    """Return ``handler()``'s response, or the recorded one for a repeated ``key``."""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {'error': f'Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters'}, status=status.HTTP_400_BAD_REQUEST,
+        )
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+    while True:
+        record, owned = _claim(scope, user_id, key, request_fingerprint)
+        if owned:
+            break
+        if record is None:
+            continue  # ✅ The in-flight request failed and released the key: claim it ourselves
+        if record.fingerprint != request_fingerprint:
+            return _mismatch()
+        if record.state == 'done':
+            return _replay(record)
+        if time.monotonic() >= deadline:
+            response = Response(
+                {'error': 'A request with this Idempotency-Key is still in progress'}, status=status.HTTP_409_CONFLICT,
+            )
+            response['Retry-After'] = str(settings.IDEMPOTENCY_WAIT_SECONDS)
+            return response
+        time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+    response = None
+    try:
+        response = handler()
+    finally:
+        # ✅ Matched on our lock: if we overran it and another request took over, leave its claim alone
+        mine = IdempotencyRecord.objects.filter(id=record.id, state='in_flight', locked_until=record.locked_until)
+        if response is not None and status.is_success(response.status_code):
+            mine.update(
+                state='done', response_status=response.status_code, response_data=response.data,
+                expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_TTL),
+            )
+        else:
+            mine.delete()  # ✅ Errors aren't recorded; the retry runs for real
+    return response
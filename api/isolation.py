@@ -0,0 +1,77 @@
+"""Disposable worker processes for code that parses untrusted documents.
+
+Each pool reads its size, per-call timeout and per-worker memory cap from
+settings (by name, so ``override_settings`` applies). A call that hangs or
+kills its worker tears the whole pool down; the next call starts a fresh one.
+Functions and arguments cross a ``spawn`` boundary, so they must be
+importable without Django being set up.
+"""
+import resource
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+
+
+class WorkerError(Exception):
+    """The worker timed out or died before returning a result."""
+
+
+def _limit_memory(limit_mb):
+    if limit_mb:
+        limit = limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class IsolatedPool:
+    """A lazily started process pool that is torn down when a worker hangs or dies."""
+
+    def __init__(self, workers_setting, timeout_setting, memory_limit_setting):
+        self.workers_setting = workers_setting
+        self.timeout_setting = timeout_setting
+        self.memory_limit_setting = memory_limit_setting
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def enabled(self):
+        return getattr(settings, self.workers_setting) > 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, self.workers_setting),
+                    mp_context=get_context('spawn'),
+                    initializer=_limit_memory,
+                    initargs=(getattr(settings, self.memory_limit_setting),),
+                )
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # ✅ A hung worker never returns on its own; kill it with the pool
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args, retries=1):
+        """``fn(*args)`` in a worker; exceptions raised by ``fn`` propagate unchanged."""
+        executor = self._get_executor()
+        future = executor.submit(fn, *args)
+        timeout = getattr(settings, self.timeout_setting)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self._discard(executor)
+            raise WorkerError(f"Timed out after {timeout}s")
+        except BrokenProcessPool:
+            # Our worker died (memory limit) or another call's timeout killed the pool
+            self._discard(executor)
+            if retries:
+                return self.run(fn, *args, retries=retries - 1)
+            raise WorkerError("Worker process crashed (memory limit exceeded?)")
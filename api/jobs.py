@@ -0,0 +1,104 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadJob
+from .renditions import RenditionError
+from .uploads import PageCountError, resolve_document
+
+logger = logging.getLogger(__name__)
+
+# ✅ The file itself is unreadable: retrying can't help, so these fail the order at once
+PERMANENT_ERRORS = (PageCountError, RenditionError)
+
+
+def claim_job():
+    """Lock the next due job, push its ``run_after`` out by the lease and return it.
+
+    ``skip_locked`` lets several worker processes poll the same table
+    without waiting on each other. A worker that dies mid-job simply lets
+    the lease expire and the job becomes due again.
+    """
+    with transaction.atomic():
+        job = (
+            UploadJob.objects.select_for_update(skip_locked=True)
+            .filter(run_after__lte=timezone.now())
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.attempts += 1
+        job.run_after = timezone.now() + timedelta(seconds=settings.UPLOAD_JOB_LEASE)
+        job.save(update_fields=['attempts', 'run_after'])
+        return job
+
+
+def run_job(job):
+    """Resolve the document (page count + storage upload) and release the order to its store."""
+    order = job.order
+    try:
+        document = resolve_document(job.spool_path, job.original_name, job.sha256 or None)
+    except PERMANENT_ERRORS as e:
+        give_up(job, e)
+        return False
+    except Exception as e:
+        fail_job(job, e)  # ✅ Storage or database trouble: worth another try
+        return False
+
+    with transaction.atomic():
+        order.document = document
+        order.num_pages = document.num_pages
+        order.status = 'pending'
+        order.save(update_fields=['document', 'num_pages', 'status'])
+        job.delete()
+    _discard_spool(job.spool_path)
+    return True
+
+
+def give_up(job, error):
+    """Mark the order failed and drop the job and its spooled file."""
+    logger.error("Upload job for order %s failed permanently: %s", job.order_id, error)
+    with transaction.atomic():
+        job.order.status = 'failed'
+        job.order.save(update_fields=['status'])
+        job.delete()
+    _discard_spool(job.spool_path)
+
+
+def fail_job(job, error):
+    """Schedule a retry with exponential backoff, or give up after the last attempt."""
+    job.last_error = str(error)
+    if job.attempts >= settings.UPLOAD_JOB_MAX_ATTEMPTS:
+        give_up(job, error)
+        return
+
+    delay = settings.UPLOAD_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+    logger.warning("Upload job for order %s failed (attempt %s), retrying in %ss: %s",
+                   job.order_id, job.attempts, delay, error)
+    job.run_after = timezone.now() + timedelta(seconds=delay)
+    job.save(update_fields=['last_error', 'run_after'])
+
+
+def work(poll_interval=1.0, once=False):
+    """Process jobs until the queue is empty (``once``) or forever."""
+    while True:
+        job = claim_job()
+        if job is not None:
+            run_job(job)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
+
+
+def _discard_spool(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
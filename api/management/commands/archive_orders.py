@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.archive import archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move completed orders older than ARCHIVE_AFTER_DAYS into the archive table, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=None, help="Age threshold (default: ARCHIVE_AFTER_DAYS)",
+        )
+        parser.add_argument('--batch-size', type=int, default=None, help="Orders per transaction (default: ARCHIVE_BATCH_SIZE)")
+        parser.add_argument('--max-batches', type=int, default=None, help="Stop after this many batches")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches (eases load)")
+
+    def handle(self, *args, **options):
+        days = options['older_than_days'] if options['older_than_days'] is not None else settings.ARCHIVE_AFTER_DAYS
+        batch_size = options['batch_size'] or settings.ARCHIVE_BATCH_SIZE
+        cutoff = archive_cutoff(days)
+
+        archived = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved = archive_batch(cutoff, batch_size)
+            if not moved:
+                break
+            archived += moved
+            batches += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Batch {batches}: {moved} order(s)")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} order(s) completed before {cutoff:%Y-%m-%d %H:%M} in {batches} batch(es)"
+        ))
@@ -0,0 +1,126 @@
+import itertools
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.bench import (
+    RSSSampler, default_results_path, format_mib, make_pdf, run_concurrent, run_metadata, summarize, write_results,
+)
+from api.models import PrintOrder, Store
+
+ENDPOINTS = ['register', 'login', 'upload_file', 'get_orders', 'get_stores']
+PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test register, login, upload_file, get_orders and get_stores in-process against a throwaway "
+        "test database (DJANGO_DB=sqlite for SQLite, otherwise the configured Postgres). "
+        "Uploads go to a local fake storage backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help="Client threads per endpoint")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint")
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 5, 20, 100],
+                            help="Page counts of the synthetic PDF corpus")
+        parser.add_argument('--seed-orders', type=int, default=2000, help="Orders owned by the benchmark user")
+        parser.add_argument('--stores', type=int, default=20)
+        parser.add_argument('--repeat-uploads', action='store_true',
+                            help="Re-upload identical bytes (exercises dedup) instead of unique files")
+        parser.add_argument('--output', help="Results JSON path (default: bench-results/api-<commit>-<time>.json)")
+
+    def handle(self, *args, **options):
+        storage_dir = tempfile.mkdtemp(prefix='bench-storage-')
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST'].get('NAME'):
+            # ✅ In-memory SQLite serializes threads on table locks; a file behaves like production
+            connection.settings_dict['TEST']['NAME'] = f'{storage_dir}/bench.sqlite3'
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(
+                PRINT_STORAGE_BACKEND='api.storage.LocalFileSystemStorage',
+                LOCAL_STORAGE_ROOT=storage_dir,
+                UPLOAD_ASYNC=False,
+            ):
+                results = self.run_benchmarks(options)
+                payload = {'meta': run_metadata(**options), 'results': results}
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        path = write_results(options['output'] or default_results_path('api'), payload)
+        self.print_table(results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+
+    def run_benchmarks(self, options):
+        user = User.objects.create_user('bench', 'bench@example.com', PASSWORD)
+        stores = Store.objects.bulk_create([
+            Store(name=f'Bench Store {i}', location='Bench', contact='000') for i in range(options['stores'])
+        ])
+        PrintOrder.objects.bulk_create([
+            PrintOrder(user=user, store=stores[i % len(stores)], file_name=f'seed{i}',
+                       page_size='A4', print_type='black_white', num_pages=1 + i % 20)
+            for i in range(options['seed_orders'])
+        ], batch_size=1000)
+        token = str(RefreshToken.for_user(user).access_token)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        corpus = {pages: make_pdf(pages) for pages in options['pages']}
+        counter = itertools.count()
+
+        def register(client):
+            n = next(counter)
+            return client.post('/api/register/', {
+                'username': f'bench{n}', 'email': f'bench{n}@example.com', 'password': PASSWORD,
+            }).status_code
+
+        def login(client):
+            return client.post('/api/login/', {'email': 'bench@example.com', 'password': PASSWORD}).status_code
+
+        def upload_file(client):
+            n = next(counter)
+            pages = options['pages'][n % len(options['pages'])]
+            data = corpus[pages] if options['repeat_uploads'] else make_pdf(pages, salt=str(n))
+            return client.post('/api/upload/', {
+                'file': SimpleUploadedFile(f'bench{n}.pdf', data, content_type='application/pdf'),
+                'store_id': stores[n % len(stores)].id,
+            }, **auth).status_code
+
+        def get_orders(client):
+            return client.get('/api/orders/', **auth).status_code
+
+        def get_stores(client):
+            return client.get('/api/stores/').status_code
+
+        drivers = {
+            'register': register, 'login': login, 'upload_file': upload_file,
+            'get_orders': get_orders, 'get_stores': get_stores,
+        }
+        results = {}
+        for name in options['endpoints']:
+            self.stdout.write(f"⏱️ {name}: {options['requests']} requests x {options['concurrency']} threads")
+            tasks = [drivers[name]] * options['requests']
+            with RSSSampler() as memory:  # ✅ Per endpoint: growth over this run, not the process's lifetime peak
+                latencies, outcomes, wall = run_concurrent(tasks, options['concurrency'], make_context=Client)
+            summary = summarize(latencies, wall, memory)
+            failures = [outcome for outcome in outcomes if not (isinstance(outcome, int) and outcome < 400)]
+            summary['errors'] = len(failures)
+            summary['error_samples'] = sorted({str(outcome) for outcome in failures})[:5]
+            results[name] = summary
+        return results
+
+    def print_table(self, results):
+        header = f"{'endpoint':<12} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'RSS +MiB':>9}"
+        self.stdout.write(header)
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<12} {row['throughput_rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} "
+                f"{row['errors']:>7} {format_mib(row['rss_growth_kb']):>9}"
+            )
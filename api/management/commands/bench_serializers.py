@@ -0,0 +1,92 @@
+import gc
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from api.bench import RSSSampler, default_results_path, run_metadata, write_results
+from api.models import Document, PrintOrder, Store
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import PrintOrderSerializer, order_values, serialize_order_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare PrintOrderSerializer + JSONRenderer with the values()-based fast path used by get_orders "
+        "(query, serialize and render), at several row counts, against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per size; the best one is reported")
+        parser.add_argument('--output', help="Results JSON path (default: bench-results/serializers-<commit>-<time>.json)")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.seed(max(options['rows']))
+            results = {str(rows): self.bench(rows, options['repeat']) for rows in options['rows']}
+            payload = {'meta': {**run_metadata(**options), 'orjson': orjson is not None}, 'results': results}
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        path = write_results(options['output'] or default_results_path('serializers'), payload)
+        self.print_table(results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+
+    def seed(self, count):
+        user = User.objects.create_user('bench', 'bench@example.com', 'bench-password-123')
+        stores = Store.objects.bulk_create([
+            Store(name=f'Bench Store {i}', location='Bench', contact='000', latitude=12.9 + i / 100, longitude=77.5)
+            for i in range(20)
+        ])
+        document = Document.objects.create(sha256='0' * 64, size=1, num_pages=3, file_url='https://example.com/bench.pdf')
+        PrintOrder.objects.bulk_create([
+            PrintOrder(
+                user=user,
+                store=stores[i % len(stores)] if i % 10 else None,  # ✅ Some orders without a store
+                document=document if i % 2 else None,  # ✅ Half legacy orders with their own file_path
+                file_name=f'seed{i}', file_path=f'https://example.com/legacy{i}.pdf',
+                page_size='A4', print_type='black_white', num_pages=1 + i % 20,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+
+    def bench(self, rows, repeat):
+        queryset = PrintOrder.objects.order_by('-id')
+
+        def drf():
+            orders = queryset.select_related('user', 'store', 'document')[:rows]
+            return JSONRenderer().render(PrintOrderSerializer(orders, many=True).data)
+
+        def fast():
+            return FastJSONRenderer().render(serialize_order_rows(order_values(queryset)[:rows]))
+
+        if json.loads(drf()) != json.loads(fast()):  # ✅ Equivalent, not byte-identical (float formatting)
+            raise CommandError(f"Fast path output differs from PrintOrderSerializer at {rows} rows")
+        result = {name: self.best_of(run, repeat) for name, run in (('drf', drf), ('fast', fast))}
+        result['speedup'] = round(result['drf']['ms'] / result['fast']['ms'], 2)
+        return result
+
+    def best_of(self, run, repeat):
+        timings, growth = [], []
+        for _ in range(repeat):
+            gc.collect()
+            with RSSSampler() as memory:  # ✅ This run's own peak, not the process-wide high-water mark
+                started = time.perf_counter()
+                body = run()
+                timings.append(time.perf_counter() - started)
+            growth.append(memory.growth_kb)
+        rss_growth_kb = None if None in growth else max(growth)
+        return {'ms': round(min(timings) * 1000, 1), 'bytes': len(body), 'rss_growth_kb': rss_growth_kb}
+
+    def print_table(self, results):
+        self.stdout.write(f"{'rows':>8} {'drf ms':>10} {'fast ms':>10} {'speedup':>8} ({connection.vendor})")
+        for rows, row in results.items():
+            self.stdout.write(f"{rows:>8} {row['drf']['ms']:>10} {row['fast']['ms']:>10} {row['speedup']:>7}x")
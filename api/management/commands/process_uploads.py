@@ -0,0 +1,46 @@
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import work
+
+
+def _worker(poll_interval, once):
+    # ✅ Every process needs its own database connection
+    connections.close_all()
+    work(poll_interval=poll_interval, once=once)
+
+
+class Command(BaseCommand):
+    help = "Run a pool of worker processes that finish queued uploads (page count + storage upload)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Number of worker processes")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if settings.ORDER_EVENT_BROKER == 'api.events.InProcessBroker':
+            # ✅ Workers are separate processes: their status events can't reach the web server's streams
+            self.stdout.write(self.style.WARNING(
+                "ORDER_EVENT_BROKER is in-process: live order events from upload workers won't reach "
+                "SSE clients (set REDIS_URL or ORDER_EVENT_REDIS_URL)"
+            ))
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_worker, args=(options['poll_interval'], options['once']))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {workers} upload worker(s)"))
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
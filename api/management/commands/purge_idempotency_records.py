@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Records deleted per query")
+
+    def handle(self, *args, **options):
+        purged = 0
+        while True:
+            # ✅ expires_at is the lock deadline for in-flight records, so abandoned claims go too
+            expired = list(
+                IdempotencyRecord.objects.filter(expires_at__lt=timezone.now())
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not expired:
+                break
+            IdempotencyRecord.objects.filter(id__in=expired, expires_at__lt=timezone.now()).delete()
+            purged += len(expired)
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} idempotency record(s)"))
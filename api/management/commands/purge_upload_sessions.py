@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import UploadSession
+from api.resumable import discard_part
+
+
+class Command(BaseCommand):
+    help = "Delete expired resumable upload sessions and their part files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Sessions deleted per query")
+
+    def handle(self, *args, **options):
+        purged = 0
+        while True:
+            # ✅ Never touch a session another request is finalizing
+            expired = list(
+                UploadSession.objects.filter(expires_at__lt=timezone.now())
+                .exclude(status='finalizing')
+                .order_by('expires_at')[:options['batch_size']]
+            )
+            if not expired:
+                break
+            for session in expired:
+                discard_part(session)
+            UploadSession.objects.filter(id__in=[session.id for session in expired]).delete()
+            purged += len(expired)
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} upload session(s)"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Store
+from api.queue_stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount each store's queued jobs and pages and repair drifted counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', type=int, action='append', dest='stores', help="Only this store id (repeatable)")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it")
+
+    def handle(self, *args, **options):
+        store_ids = options['stores'] or list(Store.objects.order_by('id').values_list('id', flat=True))
+        drifted = reconcile(store_ids, dry_run=options['dry_run'])
+        for store_id, (stored, actual) in drifted.items():
+            changes = ', '.join(f"{field} {stored[field]} -> {actual[field]}" for field in actual if stored[field] != actual[field])
+            self.stdout.write(f"Store {store_id}: {changes}")
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} drift in {len(drifted)} of {len(store_ids)} store(s)"))
@@ -0,0 +1,64 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from api.models import Document
+from api.renditions import artifact_keys, missing_renditions, render_document
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Render print-ready files and thumbnails for queued orders into the artifact cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None, help="Documents rendered in parallel (default: RENDER_WORKERS)",
+        )
+        parser.add_argument('--poll-interval', type=float, default=5.0, help="Seconds to sleep when nothing is missing")
+        parser.add_argument('--once', action='store_true', help="Exit once every missing artifact is rendered")
+        parser.add_argument(
+            '--backfill', action='store_true', help="Also render thumbnails for documents uploaded before startup",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'] or settings.RENDER_WORKERS)
+        last_document_id = 0 if options['backfill'] else (Document.objects.aggregate(last=Max('id'))['last'] or 0)
+        failed = set()  # ✅ Documents that can't be rendered aren't retried every pass
+        rendered_keys = set()
+        rendered = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            while True:
+                work, last_document_id = missing_renditions(last_document_id)
+                work = {sha256: item for sha256, item in work.items() if sha256 not in failed}
+                for sha256, item in list(work.items()):
+                    if artifact_keys(sha256, **item) & rendered_keys:
+                        # ✅ Rendered earlier in this run and already evicted: re-rendering would never end
+                        failed.add(sha256)
+                        del work[sha256]
+                        logger.warning(
+                            "Artifacts for %s were evicted right after rendering; ARTIFACT_CACHE_MAX_BYTES is too "
+                            "small for the print queue", sha256[:12],
+                        )
+                futures = {sha256: threads.submit(render_document, sha256, **item) for sha256, item in work.items()}
+                for sha256, future in futures.items():
+                    try:
+                        written = future.result()
+                        rendered += len(written)
+                        rendered_keys.update(written)
+                    except Exception as e:
+                        failed.add(sha256)
+                        logger.warning("Rendering %s failed: %s", sha256[:12], e)
+
+                if work:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} artifact(s), {len(failed)} document(s) failed"))
@@ -0,0 +1,124 @@
+"""In-process counters and histograms rendered in the Prometheus text format.
+
+Values are per process; with several workers, scrape each one (or put them
+behind a multiprocess-aware exporter).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for a 2 ms store lookup and a 30 s Cloudinary upload
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = f'le="{bound}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.label_names, key, [le])} {count}')
+                le = 'le="+Inf"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, key, [le])} {series[-1]}')
+                lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {series[-2]}')
+                lines.append(f'{self.name}_count{_labels(self.label_names, key)} {series[-1]}')
+        return lines
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+http_requests = register(Counter(
+    'http_requests_total', "HTTP requests by view, method and status code.", ['view', 'method', 'status'],
+))
+http_request_duration = register(Histogram(
+    'http_request_duration_seconds', "Time spent producing a response.", ['view', 'method'],
+))
+db_queries_per_request = register(Histogram(
+    'http_request_db_queries', "Database queries issued per request.", ['view'], buckets=COUNT_BUCKETS,
+))
+db_query_duration = register(Histogram(
+    'db_query_duration_seconds', "Duration of individual database queries.", ['view', 'alias'],
+))
+stage_duration = register(Histogram(
+    'request_stage_duration_seconds',
+    "Time spent in each stage of request handling (multipart parse, page count, storage upload...).",
+    ['stage'],
+))
+
+
+def stage(name):
+    """``with stage('page_count'): ...`` records the block's duration under that stage."""
+    return stage_duration.time(stage=name)
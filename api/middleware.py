@@ -0,0 +1,58 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+from .routers import pin_to_primary
+
+
+class MetricsMiddleware:
+    """Records request count/latency and per-request query count/duration for ``/metrics``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []  # (alias, seconds)
+
+        def track_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((context['connection'].alias, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(track_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or 'unnamed') if match is not None else 'unmatched'
+        metrics.http_requests.inc(view=view, method=request.method, status=response.status_code)
+        metrics.http_request_duration.observe(elapsed, view=view, method=request.method)
+        metrics.db_queries_per_request.observe(len(queries), view=view)
+        for alias, seconds in queries:
+            metrics.db_query_duration.observe(seconds, view=view, alias=alias)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """After a successful write, read from the primary for ``REPLICA_PIN_SECONDS`` (read-your-writes)."""
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DATABASE_REPLICAS and request.method not in self.SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)  # ✅ DRF sets this once the view has authenticated
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.id)
+        return response
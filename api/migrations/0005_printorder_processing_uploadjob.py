@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_printorder_file_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='printorder',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('pending', 'Pending'), ('printing', 'Printing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spool_path', models.TextField()),
+                ('original_name', models.CharField(max_length=255)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='upload_job', to='api.printorder')),
+            ],
+        ),
+    ]
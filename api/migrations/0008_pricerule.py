@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Prices that used to be hard-coded in PrintOrder.total_cost()
+DEFAULT_PRICES = {
+    ('A4', 'black_white'): 2,
+    ('A4', 'color'): 5,
+    ('A3', 'black_white'): 4,
+    ('A3', 'color'): 10,
+}
+
+
+def seed_default_prices(apps, schema_editor):
+    PriceRule = apps.get_model('api', 'PriceRule')
+    for (page_size, print_type), price in DEFAULT_PRICES.items():
+        PriceRule.objects.get_or_create(
+            store=None, page_size=page_size, print_type=print_type, defaults={'price_per_page': price},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_printorder_claim_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_size', models.CharField(choices=[('A4', 'A4'), ('A3', 'A3')], max_length=10)),
+                ('print_type', models.CharField(choices=[('black_white', 'Black & White'), ('color', 'Color')], max_length=20)),
+                ('price_per_page', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('store', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_rules', to='api.store')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('store', 'page_size', 'print_type'), name='unique_store_price_rule'), models.UniqueConstraint(condition=models.Q(('store__isnull', True)), fields=('page_size', 'print_type'), name='unique_default_price_rule')],
+            },
+        ),
+        migrations.RunPython(seed_default_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_pricerule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),  # ✅ Index auth_user after its last rebuild
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='printorder',
+            index=models.Index(fields=['user', '-id'], name='printorder_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printorder',
+            index=models.Index(fields=['store', 'status', 'uploaded_at'], name='printorder_store_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printorder',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['store', 'id'], name='printorder_store_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printorder',
+            index=models.Index(condition=models.Q(('status', 'printing')), fields=['store', 'lease_expires_at'], name='printorder_store_lease_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadjob',
+            index=models.Index(fields=['run_after'], name='uploadjob_run_after_idx'),
+        ),
+        # ✅ login/register look users up by email, which auth_user doesn't index
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS api_auth_user_email_idx ON auth_user (email);',
+            reverse_sql='DROP INDEX IF EXISTS api_auth_user_email_idx;',
+        ),
+    ]
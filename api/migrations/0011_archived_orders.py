@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_upload_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPrintOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('file_name', models.CharField(default='Untitled', max_length=255)),
+                ('file_path', models.TextField(default='')),
+                ('page_size', models.CharField(choices=[('A4', 'A4'), ('A3', 'A3')], max_length=10)),
+                ('num_copies', models.PositiveIntegerField(default=1)),
+                ('print_type', models.CharField(choices=[('black_white', 'Black & White'), ('color', 'Color')], max_length=20)),
+                ('num_pages', models.PositiveIntegerField(default=1)),
+                ('status', models.CharField(default='completed', max_length=20)),
+                ('uploaded_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='printorder',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['uploaded_at'], name='printorder_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedprintorder',
+            name='document',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='api.document'),
+        ),
+        migrations.AddField(
+            model_name='archivedprintorder',
+            name='store',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='api.store'),
+        ),
+        migrations.AddField(
+            model_name='archivedprintorder',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedprintorder',
+            index=models.Index(fields=['user', '-id'], name='archivedorder_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedprintorder',
+            index=models.Index(fields=['store', 'uploaded_at'], name='archivedorder_store_date_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def seed_queue_stats(apps, schema_editor):
+    """Start every store's counters from the orders already queued."""
+    Store = apps.get_model('api', 'Store')
+    PrintOrder = apps.get_model('api', 'PrintOrder')
+    StoreQueueStats = apps.get_model('api', 'StoreQueueStats')
+    stats = {store_id: StoreQueueStats(store_id=store_id) for store_id in Store.objects.values_list('id', flat=True)}
+    rows = (
+        PrintOrder.objects.filter(store__isnull=False, status__in=['pending', 'printing'])
+        .values('store_id', 'status')
+        .annotate(jobs=Count('id'), pages=Sum(F('num_pages') * F('num_copies')))
+    )
+    for row in rows:
+        setattr(stats[row['store_id']], f"{row['status']}_jobs", row['jobs'])
+        setattr(stats[row['store_id']], f"{row['status']}_pages", row['pages'] or 0)
+    StoreQueueStats.objects.bulk_create(stats.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_archived_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreQueueStats',
+            fields=[
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='queue_stats', serialize=False, to='api.store')),
+                ('pending_jobs', models.IntegerField(default=0)),
+                ('pending_pages', models.IntegerField(default=0)),
+                ('printing_jobs', models.IntegerField(default=0)),
+                ('printing_pages', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='pages_per_minute',
+            field=models.PositiveIntegerField(default=20),
+        ),
+        migrations.RunPython(seed_queue_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_store_queue_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedprintorder',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='printorder',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
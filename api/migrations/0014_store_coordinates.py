@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_order_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
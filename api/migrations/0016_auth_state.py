@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_idempotency_records'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='auth_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('token_version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:18
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_store_directory_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='printorder',
+            name='printorder_completed_idx',
+        ),
+        migrations.AddField(
+            model_name='archivedprintorder',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='printorder',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='printorder',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('completed_at', 'uploaded_at'), condition=models.Q(('status', 'completed')), name='printorder_completed_idx'),
+        ),
+    ]
@@ -1,41 +1,319 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+PAGE_SIZE_CHOICES = [('A4', 'A4'), ('A3', 'A3')]
+PRINT_TYPE_CHOICES = [('black_white', 'Black & White'), ('color', 'Color')]
 
 # Store Model
 class Store(models.Model):
     name = models.CharField(max_length=255)
     location = models.CharField(max_length=255)
     contact = models.CharField(max_length=100)
+    pages_per_minute = models.PositiveIntegerField(default=20)  # ✅ Printer throughput, for wait estimates
+    latitude = models.FloatField(null=True, blank=True)  # ✅ Optional: stores without coordinates aren't in nearest-store results
+    longitude = models.FloatField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.name} ({self.location})"
 
+# Store Directory Version Model (a single row, bumped on every store change; keys the store caches)
+class StoreDirectoryVersion(models.Model):
+    version = models.BigIntegerField(default=0)  # ✅ Microsecond timestamp of the last store change
+
+    def __str__(self):
+        return f"Store directory version {self.version}"
+
+# Store Queue Stats Model (denormalized counters, updated with F() on every order status change)
+class StoreQueueStats(models.Model):
+    store = models.OneToOneField(Store, on_delete=models.CASCADE, primary_key=True, related_name="queue_stats")
+    # ✅ Plain integers: drift must never make a write fail; reconcile_queue_stats repairs it
+    pending_jobs = models.IntegerField(default=0)
+    pending_pages = models.IntegerField(default=0)  # ✅ Sheets: num_pages * num_copies
+    printing_jobs = models.IntegerField(default=0)
+    printing_pages = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Queue for store #{self.store_id}: {self.pending_jobs} pending, {self.printing_jobs} printing"
+
+# Document Model (content-addressed: one row per distinct file)
+class Document(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)  # ✅ Streaming SHA-256 of the file bytes
+    file_name = models.CharField(max_length=255, default="Untitled")
+    file_url = models.TextField()
+    num_pages = models.PositiveIntegerField(default=1)
+    size = models.PositiveBigIntegerField(default=0)  # ✅ Bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.sha256[:12]}, {self.num_pages} pages)"
+
+# Price Rule Model (price per page; store=None is the default for every store)
+class PriceRule(models.Model):
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, null=True, blank=True, related_name="price_rules")
+    page_size = models.CharField(max_length=10, choices=PAGE_SIZE_CHOICES)
+    print_type = models.CharField(max_length=20, choices=PRINT_TYPE_CHOICES)
+    price_per_page = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'page_size', 'print_type'], name='unique_store_price_rule'),
+            models.UniqueConstraint(
+                fields=['page_size', 'print_type'], condition=Q(store__isnull=True), name='unique_default_price_rule',
+            ),
+        ]
+
+    def __str__(self):
+        store_info = self.store.name if self.store else "Default"
+        return f"{store_info}: {self.page_size} {self.print_type} = {self.price_per_page}/page"
+
+class PrintOrderQuerySet(models.QuerySet):
+    def with_cost(self):
+        """Annotate ``unit_price`` and ``cost`` in SQL from the store's (or default) price rules."""
+        rules = PriceRule.objects.filter(page_size=OuterRef('page_size'), print_type=OuterRef('print_type'))
+        money = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            unit_price=Coalesce(
+                Subquery(rules.filter(store=OuterRef('store_id')).values('price_per_page')[:1]),
+                Subquery(rules.filter(store__isnull=True).values('price_per_page')[:1]),
+                Value(0, output_field=money),
+                output_field=money,
+            ),
+            cost=ExpressionWrapper(F('unit_price') * F('num_pages') * F('num_copies'), output_field=money),
+        )
+
+    def delete(self):
+        """Delete, first taking queued orders off their store's queue counters.
+
+        Done here rather than in a ``post_delete`` receiver, which would turn
+        off Django's fast delete (e.g. for ``archive_orders`` batches).
+        """
+        if self.model is not PrintOrder:
+            return super().delete()
+        from .queue_stats import release_queued
+        with transaction.atomic(using=self.db):
+            release_queued(self)
+            return super().delete()
+
 # Print Order Model
 class PrintOrder(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")  # ✅ Reverse lookup: user.orders.all()
     store = models.ForeignKey(Store, on_delete=models.CASCADE, null=True, blank=True, related_name="orders")  # ✅ store.orders.all()
+    document = models.ForeignKey(Document, on_delete=models.PROTECT, null=True, blank=True, related_name="orders")  # ✅ Shared stored file
     file = models.FileField(upload_to='uploads/')  # ✅ File upload field
     file_name = models.CharField(max_length=255, default="Untitled")  # ✅ Default to avoid null issues
-    file_path = models.TextField(default="")  # ✅ Allows longer file paths
-    page_size = models.CharField(max_length=10, choices=[('A4', 'A4'), ('A3', 'A3')])
+    file_path = models.TextField(default="")  # ✅ Legacy orders only; new orders use document.file_url
+    page_size = models.CharField(max_length=10, choices=PAGE_SIZE_CHOICES)
     num_copies = models.PositiveIntegerField(default=1)  # ✅ Prevents negative values
-    print_type = models.CharField(max_length=20, choices=[('black_white', 'Black & White'), ('color', 'Color')])
+    print_type = models.CharField(max_length=20, choices=PRINT_TYPE_CHOICES)
     num_pages = models.PositiveIntegerField(default=1)  # ✅ Prevents negative values
     status = models.CharField(
         max_length=20,
-        choices=[('pending', 'Pending'), ('printing', 'Printing'), ('completed', 'Completed')],
+        choices=[
+            ('processing', 'Processing'),
+            ('pending', 'Pending'),
+            ('printing', 'Printing'),
+            ('completed', 'Completed'),
+            ('failed', 'Failed'),
+        ],
         default='pending'
     )  # ✅ Order status tracking
+    version = models.PositiveIntegerField(default=1)  # ✅ Bumped on every queue/status update (optimistic concurrency)
+    claimed_by = models.CharField(max_length=100, blank=True, default="")  # ✅ Print agent holding the job
+    lease_expires_at = models.DateTimeField(null=True, blank=True)  # ✅ Claim goes back to the queue after this
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)  # ✅ When it reached "completed"; archive_orders ages by it
+
+    objects = PrintOrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # ✅ get_orders for a user: WHERE user_id = ? ORDER BY id DESC
+            models.Index(fields=['user', '-id'], name='printorder_user_recent_idx'),
+            # ✅ Store dashboards / reports: WHERE store_id = ? AND status = ? AND uploaded_at ...
+            models.Index(fields=['store', 'status', 'uploaded_at'], name='printorder_store_status_idx'),
+            # ✅ Store queue: only pending rows, oldest first
+            models.Index(fields=['store', 'id'], condition=Q(status='pending'), name='printorder_store_pending_idx'),
+            # ✅ Expired claim leases waiting to be re-queued
+            models.Index(
+                fields=['store', 'lease_expires_at'], condition=Q(status='printing'), name='printorder_store_lease_idx',
+            ),
+            # ✅ archive_orders: oldest completed orders first (orders from before completed_at by upload time)
+            models.Index(
+                Coalesce('completed_at', 'uploaded_at'), condition=Q(status='completed'), name='printorder_completed_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')  # ✅ Lets post_save spot status transitions
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        saves_status = update_fields is None or 'status' in update_fields
+        if self.status == 'completed' and self.completed_at is None and saves_status:
+            self.completed_at = timezone.now()
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, 'completed_at']
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        from .queue_stats import release_queued
+        with transaction.atomic():
+            release_queued(PrintOrder.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
+    @property
+    def file_url(self):
+        """Storage URL, from the shared document when there is one."""
+        return self.document.file_url if self.document_id else self.file_path
 
     def total_cost(self):
-        """Calculate cost dynamically based on page size and print type."""
-        price_per_page = {
-            'A4': {'black_white': 2, 'color': 5},
-            'A3': {'black_white': 4, 'color': 10}
-        }
-        return self.num_pages * self.num_copies * price_per_page[self.page_size][self.print_type]
+        """Calculate cost from the cached price rules (use ``with_cost()`` for querysets)."""
+        from .pricing import price_per_page
+        return self.num_pages * self.num_copies * price_per_page(self.store_id, self.page_size, self.print_type)
 
     def __str__(self):
         store_info = self.store.name if self.store else "Not Assigned"
         return f"📄 {self.file_name} - {self.page_size} - {self.num_copies} copies - {self.status} - Store: {store_info}"
+
+# Archived Print Order Model (cold storage for old completed orders; same ids as PrintOrder)
+class ArchivedPrintOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # ✅ Keeps the original PrintOrder id
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_orders")
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, null=True, blank=True, related_name="archived_orders")
+    document = models.ForeignKey(Document, on_delete=models.PROTECT, null=True, blank=True, related_name="archived_orders")
+    file_name = models.CharField(max_length=255, default="Untitled")
+    file_path = models.TextField(default="")
+    page_size = models.CharField(max_length=10, choices=PAGE_SIZE_CHOICES)
+    num_copies = models.PositiveIntegerField(default=1)
+    print_type = models.CharField(max_length=20, choices=PRINT_TYPE_CHOICES)
+    num_pages = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=20, default='completed')
+    version = models.PositiveIntegerField(default=1)
+    uploaded_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PrintOrderQuerySet.as_manager()  # ✅ with_cost() works on the archive too
+
+    # Columns copied over from PrintOrder by api.archive
+    COPIED_FIELDS = [
+        'id', 'user_id', 'store_id', 'document_id', 'file_name', 'file_path', 'page_size',
+        'num_copies', 'print_type', 'num_pages', 'status', 'version', 'uploaded_at', 'completed_at',
+    ]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='archivedorder_user_recent_idx'),
+            models.Index(fields=['store', 'uploaded_at'], name='archivedorder_store_date_idx'),
+        ]
+
+    file_url = PrintOrder.file_url
+
+    def __str__(self):
+        return f"📦 {self.file_name} - {self.page_size} - {self.num_copies} copies - archived"
+
+# Upload Job Model (background page count + storage upload)
+class UploadJob(models.Model):
+    order = models.OneToOneField(PrintOrder, on_delete=models.CASCADE, related_name="upload_job")
+    spool_path = models.TextField()  # ✅ Local copy of the upload waiting for a worker
+    original_name = models.CharField(max_length=255)
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)  # ✅ Retry backoff / claim lease
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after'], name='uploadjob_run_after_idx'),  # ✅ Next due job
+        ]
+
+    def __str__(self):
+        return f"Job for order #{self.order_id} ({self.attempts} attempts)"
+
+# Upload Session Model (resumable chunked upload; chunks are written in place into one part file)
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # ✅ Unguessable upload URL
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="upload_sessions")
+    order = models.OneToOneField(PrintOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name="upload_session")
+    file_name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()  # ✅ Total bytes the client will send
+    chunk_size = models.PositiveIntegerField()  # ✅ Every chunk but the last is exactly this long
+    page_size = models.CharField(max_length=10, choices=PAGE_SIZE_CHOICES)
+    num_copies = models.PositiveIntegerField(default=1)
+    print_type = models.CharField(max_length=20, choices=PRINT_TYPE_CHOICES)
+    status = models.CharField(
+        max_length=20,
+        choices=[('open', 'Open'), ('finalizing', 'Finalizing'), ('completed', 'Completed')],
+        default='open'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()  # ✅ Pushed out by every chunk; purge_upload_sessions deletes the rest
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='uploadsession_expires_idx'),
+        ]
+
+    @property
+    def num_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.file_name}, {self.size} bytes, {self.status})"
+
+# Upload Chunk Model (one row per chunk fully written to the part file)
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()  # ✅ offset // session.chunk_size
+    size = models.PositiveIntegerField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_upload_chunk'),
+        ]
+
+# Idempotency Record Model (one per Idempotency-Key; shared by every worker, unlike a per-process cache)
+class IdempotencyRecord(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_records")
+    scope = models.CharField(max_length=50)  # ✅ Endpoint, e.g. "upload"
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # ✅ SHA-256 of what makes two requests "the same"
+    state = models.CharField(
+        max_length=20, choices=[('in_flight', 'In flight'), ('done', 'Done')], default='in_flight'
+    )
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField()  # ✅ In-flight claim is taken over after this (worker died)
+    expires_at = models.DateTimeField()  # ✅ purge_idempotency_records deletes the rest
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} key {self.key!r} for user #{self.user_id} ({self.state})"
+
+# Auth State Model (per-user token version; bumping it revokes every token issued before)
+class AuthState(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="auth_state")
+    token_version = models.PositiveIntegerField(default=0)  # ✅ Compared against the "tv" token claim
+
+    def __str__(self):
+        return f"Auth state for user #{self.user_id} (token version {self.token_version})"
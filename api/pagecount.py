@@ -0,0 +1,173 @@
+"""Page counting for every format we print.
+
+Counts come from metadata or document structure where the format allows
+it (DOCX/PPTX ``docProps/app.xml``, TIFF IFD chains) and fall back to
+PyMuPDF otherwise. Counting runs in a pool of worker processes with a
+per-document timeout and address-space limit, so a hostile or broken file
+can only take down a disposable worker. Results are cached by content hash.
+"""
+import os
+import re
+import struct
+import zipfile
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .cache import LRUCache
+from .isolation import IsolatedPool
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
+_SLIDE_NAME = re.compile(r'^ppt/slides/slide\d+\.xml$')
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class PageCountError(Exception):
+    """The document could not be opened to count its pages."""
+
+
+# ----------------------------------------------------------------------
+# Counters (run inside worker processes; keep them free of Django imports)
+# ----------------------------------------------------------------------
+
+def _app_properties(zf, tag):
+    """Integer ``<tag>`` from ``docProps/app.xml``, if the producer wrote one."""
+    try:
+        with zf.open('docProps/app.xml') as f:
+            for _, element in ElementTree.iterparse(f):
+                if element.tag.endswith('}' + tag) and (element.text or '').strip().isdigit():
+                    return int(element.text)
+    except KeyError:
+        pass
+    return None
+
+
+def count_pdf(path):
+    import fitz  # PyMuPDF; file-backed, pages are not parsed to count them
+    with fitz.open(path, filetype="pdf") as pdf:
+        return pdf.page_count
+
+
+def count_docx(path):
+    with zipfile.ZipFile(path) as zf:
+        pages = _app_properties(zf, 'Pages')
+        if pages:
+            return pages
+        # ✅ No cached count (e.g. generated files): hard page breaks + 1
+        breaks = 0
+        with zf.open('word/document.xml') as f:
+            for _, element in ElementTree.iterparse(f):
+                if element.tag == f'{_WORD_NS}br' and element.get(f'{_WORD_NS}type') == 'page':
+                    breaks += 1
+                element.clear()
+        return breaks + 1
+
+
+def count_pptx(path):
+    with zipfile.ZipFile(path) as zf:
+        return _app_properties(zf, 'Slides') or sum(1 for name in zf.namelist() if _SLIDE_NAME.match(name)) or 1
+
+
+def count_tiff(path):
+    """Walk the IFD chain; only headers are read, never pixel data."""
+    with open(path, 'rb') as f:
+        header = f.read(8)
+        if header[:2] == b'II':
+            endian = '<'
+        elif header[:2] == b'MM':
+            endian = '>'
+        else:
+            raise ValueError("Not a TIFF file")
+        magic, offset = struct.unpack(endian + 'HI', header[2:8])
+        if magic != 42:
+            return count_with_pymupdf(path)  # BigTIFF and friends
+
+        size = os.fstat(f.fileno()).st_size
+        seen = set()
+        pages = 0
+        while offset and offset not in seen and offset + 2 <= size:
+            seen.add(offset)
+            f.seek(offset)
+            (entries,) = struct.unpack(endian + 'H', f.read(2))
+            f.seek(offset + 2 + entries * 12)
+            next_offset = f.read(4)
+            pages += 1
+            if len(next_offset) < 4:
+                break
+            (offset,) = struct.unpack(endian + 'I', next_offset)
+        return max(pages, 1)
+
+
+def count_with_pymupdf(path):
+    import fitz
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+# Extension -> dotted path; settings.PAGE_COUNTERS adds to / overrides these.
+# Paths (not functions) cross the process boundary, so plug-ins work in workers.
+COUNTERS = {
+    '.pdf': 'api.pagecount.count_pdf',
+    '.docx': 'api.pagecount.count_docx',
+    '.pptx': 'api.pagecount.count_pptx',
+    '.tif': 'api.pagecount.count_tiff',
+    '.tiff': 'api.pagecount.count_tiff',
+}
+
+
+def counter_for(file_name):
+    """Dotted path of the counter for ``file_name``, or None for single-page images."""
+    extension = os.path.splitext(file_name)[1].lower()
+    counters = {**COUNTERS, **settings.PAGE_COUNTERS}
+    if extension in counters:
+        return counters[extension]
+    if extension in IMAGE_EXTENSIONS:
+        return None
+    return 'api.pagecount.count_other'
+
+
+def count_other(path):
+    try:
+        return count_with_pymupdf(path)
+    except Exception:
+        return 1  # ✅ Formats PyMuPDF can't read still print as one page
+
+
+def count_file(path, counter_path):
+    """Worker entry point: run the counter at ``counter_path`` on ``path``."""
+    return import_string(counter_path)(path)
+
+
+# ----------------------------------------------------------------------
+# Request side
+# ----------------------------------------------------------------------
+
+pool = IsolatedPool('PAGE_COUNT_WORKERS', 'PAGE_COUNT_TIMEOUT', 'PAGE_COUNT_MEMORY_LIMIT_MB')
+_counts = LRUCache(maxsize=4096)
+
+
+def count_pages(path, file_name, digest=None):
+    """Page count for the file at ``path``; ``digest`` (SHA-256) enables the result cache.
+
+    Raises :class:`PageCountError` when the document can't be read.
+    """
+    if digest is not None:
+        cached = _counts.get(digest)
+        if cached is not None:
+            return cached
+
+    counter_path = counter_for(file_name)
+    if counter_path is None:
+        return 1
+    try:
+        if pool.enabled:
+            pages = pool.run(count_file, path, counter_path)
+        else:
+            pages = count_file(path, counter_path)  # ✅ Inline mode (tests, one-off scripts)
+    except Exception as e:
+        raise PageCountError(str(e) or type(e).__name__) from e
+
+    if digest is not None:
+        _counts.set(digest, pages)
+    return pages
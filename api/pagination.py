@@ -0,0 +1,84 @@
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+
+def page_size_from(request):
+    """Requested ``limit``, clamped to ``ORDERS_MAX_PAGE_SIZE``."""
+    limit = request.query_params.get('limit')
+    if not limit:
+        return settings.ORDERS_PAGE_SIZE
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValidationError({'limit': "Limit must be a positive integer"})
+    return min(int(limit), settings.ORDERS_MAX_PAGE_SIZE)
+
+
+ARCHIVE_CURSOR_PREFIX = 'a'
+
+
+def cursor_from(request):
+    """The ``cursor`` query param as ``(in_archive, last_id)``.
+
+    Plain ids page through the hot table; ``a<id>`` (or a bare ``a``, the
+    start of the archive) pages through archived orders.
+    """
+    cursor = request.query_params.get('cursor')
+    if not cursor:
+        return False, None
+    in_archive = cursor.startswith(ARCHIVE_CURSOR_PREFIX)
+    if in_archive:
+        cursor = cursor[len(ARCHIVE_CURSOR_PREFIX):]
+        if not cursor:
+            return True, None
+    if not cursor.isdigit():
+        raise ValidationError({'cursor': "Invalid cursor"})
+    return in_archive, int(cursor)
+
+
+def _row_id(row):
+    return row['id'] if isinstance(row, dict) else row.id  # ✅ Model instances or values() rows
+
+
+def _page(queryset, cursor, limit):
+    if cursor is not None:
+        queryset = queryset.filter(id__lt=cursor)
+    return list(queryset.order_by('-id')[:limit + 1])
+
+
+def keyset_paginate(queryset, request, archive=None):
+    """Return one page of ``queryset`` ordered by ``-id`` plus the next cursor.
+
+    Keyset pagination (``id < cursor``) stays an index range scan however
+    deep the client pages, unlike OFFSET. With an ``archive`` queryset the
+    hot rows come first; the archive is only read once they run out, and
+    its pages get ``a<id>`` cursors.
+    """
+    limit = page_size_from(request)
+    in_archive, cursor = cursor_from(request)
+
+    rows = []
+    if in_archive and archive is None:
+        return rows, None
+    if not in_archive:
+        rows = _page(queryset, cursor, limit)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, _row_id(rows[-1])
+        if archive is None:
+            return rows, None
+        cursor = None  # ✅ Hot set exhausted: fill the rest of the page from the start of the archive
+
+    remaining = limit - len(rows)
+    archived = _page(archive, cursor, remaining)
+    if len(archived) > remaining:
+        archived = archived[:remaining]
+        last_id = _row_id(archived[-1]) if archived else ''
+        return rows + archived, f"{ARCHIVE_CURSOR_PREFIX}{last_id}"
+    return rows + archived, None
+
+
+def paginated_payload(request, results, next_cursor):
+    next_url = None
+    if next_cursor is not None:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+    return {'next': next_url, 'next_cursor': next_cursor, 'results': results}
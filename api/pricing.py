@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from django.conf import settings
+
+from .cache import LRUCache
+from .models import PriceRule
+
+# ✅ Whole price table in memory; dropped on any PriceRule change, refreshed after the TTL
+_table = LRUCache(maxsize=1, ttl=settings.PRICE_CACHE_TTL)
+
+
+def price_table():
+    """``{(store_id, page_size, print_type): price_per_page}``; ``store_id`` None is the default."""
+    table = _table.get('rules')
+    if table is None:
+        table = {
+            (store_id, page_size, print_type): price
+            for store_id, page_size, print_type, price in PriceRule.objects.values_list(
+                'store_id', 'page_size', 'print_type', 'price_per_page',
+            )
+        }
+        _table.set('rules', table)
+    return table
+
+
+def price_per_page(store_id, page_size, print_type):
+    table = price_table()
+    price = table.get((store_id, page_size, print_type))
+    if price is None:
+        price = table.get((None, page_size, print_type), Decimal('0'))
+    return price
+
+
+def invalidate():
+    _table.clear()
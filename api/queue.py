@@ -0,0 +1,87 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .events import publish_status_change
+from .models import PrintOrder
+from .queue_stats import record_status_change
+
+
+def claimable(store_id, now):
+    """Pending jobs for a store, plus printing jobs whose claim lease has run out."""
+    return PrintOrder.objects.filter(store_id=store_id).filter(
+        Q(status='pending') | Q(status='printing', lease_expires_at__lt=now)
+    )
+
+
+def claim_jobs(store_id, agent_id, limit, lease_seconds):
+    """Atomically claim up to ``limit`` of the oldest jobs for ``agent_id``.
+
+    Rows are locked with ``SKIP LOCKED``, so agents claiming concurrently for
+    the same store each get a disjoint batch instead of queueing behind one
+    another. Returns ``(orders, lease_expires_at)`` with orders sorted by
+    ``page_size`` and ``print_type``.
+    """
+    now = timezone.now()
+    lease_expires_at = now + timedelta(seconds=lease_seconds)
+    with transaction.atomic():
+        previous = dict(
+            claimable(store_id, now)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', 'status')[:limit]
+        )
+        ids = list(previous)
+        PrintOrder.objects.filter(id__in=ids).update(
+            status='printing', claimed_by=agent_id, lease_expires_at=lease_expires_at, version=F('version') + 1,
+        )
+        orders = list(
+            PrintOrder.objects.filter(id__in=ids)
+            .select_related('user', 'store', 'document')
+            .order_by('page_size', 'print_type', 'id')
+        )
+        publish_status_change(orders, 'printing', previous)  # ✅ Re-claimed expired leases were already printing
+        record_status_change(orders, 'printing', previous)  # ✅ Same transaction as the claim: no drift on errors
+    return orders, lease_expires_at
+
+
+def group_jobs(orders):
+    """Group claimed orders by tray (page size) and colour mode, in spool order."""
+    return [
+        {'page_size': page_size, 'print_type': print_type, 'orders': list(batch)}
+        for (page_size, print_type), batch in groupby(orders, key=lambda o: (o.page_size, o.print_type))
+    ]
+
+
+def _held(store_id, agent_id, order_ids, now):
+    """Jobs ``agent_id`` still holds: an expired lease is up for grabs, so it no longer counts."""
+    return PrintOrder.objects.filter(
+        store_id=store_id, id__in=order_ids, status='printing', claimed_by=agent_id, lease_expires_at__gte=now,
+    )
+
+
+def renew_lease(store_id, agent_id, order_ids, lease_seconds):
+    """Extend the lease on jobs this agent still holds; returns the ids renewed."""
+    now = timezone.now()
+    lease_expires_at = now + timedelta(seconds=lease_seconds)
+    held = _held(store_id, agent_id, order_ids, now)
+    with transaction.atomic():
+        renewed = list(held.select_for_update().values_list('id', flat=True))
+        PrintOrder.objects.filter(id__in=renewed).update(lease_expires_at=lease_expires_at)
+    return renewed, lease_expires_at
+
+
+def complete_jobs(store_id, agent_id, order_ids):
+    """Mark jobs this agent holds as completed; returns the ids completed."""
+    held = _held(store_id, agent_id, order_ids, timezone.now())
+    with transaction.atomic():
+        completed = list(held.select_for_update().only('id', 'user_id', 'store_id', 'num_pages', 'num_copies'))
+        PrintOrder.objects.filter(id__in=[o.id for o in completed]).update(
+            status='completed', lease_expires_at=None, completed_at=timezone.now(), version=F('version') + 1,
+        )
+        publish_status_change(completed, 'completed', 'printing')
+        record_status_change(completed, 'completed', 'printing')
+    return [o.id for o in completed]
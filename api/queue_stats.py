@@ -0,0 +1,132 @@
+"""Per-store queue counters, kept current with ``F()`` updates.
+
+Every path that creates, deletes or changes the status of an order
+reports the transition here: single saves through the PrintOrder
+signals, deletes through ``PrintOrder.delete``/``PrintOrderQuerySet.delete``
+(and a User ``pre_delete`` receiver for cascades), bulk paths
+(``bulk_create``, queue claims/completions) explicitly. Reading a store's
+queue is then one primary-key lookup instead of a COUNT/SUM over orders.
+``reconcile_queue_stats`` repairs any drift.
+"""
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import PrintOrder, Store, StoreQueueStats
+from .routers import reading_from
+
+QUEUED_STATUSES = ('pending', 'printing')
+COUNTER_FIELDS = ['pending_jobs', 'pending_pages', 'printing_jobs', 'printing_pages']
+
+
+def sheets(order):
+    return order.num_pages * order.num_copies
+
+
+def record_transitions(transitions):
+    """Apply ``(store_id, sheets, old_status, new_status)`` tuples.
+
+    ``None`` as a status means the order didn't / no longer exists.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for store_id, pages, old, new in transitions:
+        if store_id is None or old == new:
+            continue
+        for status, sign in ((old, -1), (new, 1)):
+            if status in QUEUED_STATUSES:
+                deltas[store_id][f'{status}_jobs'] += sign
+                deltas[store_id][f'{status}_pages'] += sign * pages
+
+    # ✅ Sorted, so transactions touching several stores lock rows in the same order
+    for store_id in sorted(deltas):
+        changes = {field: F(field) + value for field, value in deltas[store_id].items() if value}
+        if not changes:
+            continue
+        changes['updated_at'] = timezone.now()
+        if not StoreQueueStats.objects.filter(store_id=store_id).update(**changes):
+            StoreQueueStats.objects.get_or_create(store_id=store_id)
+            StoreQueueStats.objects.filter(store_id=store_id).update(**changes)
+
+
+def record_status_change(orders, status, previous_status=None):
+    """Bulk-path counterpart of the PrintOrder signals.
+
+    ``previous_status`` is one status for every order, or ``{order_id: status}``.
+    """
+    previous = previous_status if isinstance(previous_status, dict) else defaultdict(lambda: previous_status)
+    record_transitions((order.store_id, sheets(order), previous[order.id], status) for order in orders)
+
+
+def release_queued(queryset):
+    """Take the queued orders in ``queryset`` off their stores' counters (call before deleting them)."""
+    rows = queryset.filter(status__in=QUEUED_STATUSES).values_list('store_id', 'num_pages', 'num_copies', 'status')
+    record_transitions((store_id, pages * copies, status, None) for store_id, pages, copies, status in rows)
+
+
+def estimated_wait_seconds(pending_pages, printing_pages, pages_per_minute):
+    """Time to print everything ahead of a new order at the store's rated speed."""
+    return round(max(0, pending_pages + printing_pages) * 60 / max(1, pages_per_minute))
+
+
+def _snapshot(row):
+    return {
+        'store_id': row['store_id'],
+        **{field: max(0, row[field]) for field in COUNTER_FIELDS},
+        'pages_per_minute': row['store__pages_per_minute'],
+        'estimated_wait_seconds': estimated_wait_seconds(
+            row['pending_pages'], row['printing_pages'], row['store__pages_per_minute'],
+        ),
+        'updated_at': row['updated_at'],
+    }
+
+
+def _rows():
+    return StoreQueueStats.objects.values('store_id', *COUNTER_FIELDS, 'store__pages_per_minute', 'updated_at')
+
+
+def queue_snapshot(store_id):
+    """Queue depth and wait estimate for one store (one indexed lookup), or None if the store doesn't exist.
+
+    Stores created without the post_save signal (``bulk_create``) get their
+    counter row here, counted from their orders.
+    """
+    row = _rows().filter(store_id=store_id).first()
+    if row is None:
+        if not Store.objects.filter(id=store_id).exists():
+            return None
+        reconcile([store_id])
+        with reading_from(DEFAULT_DB_ALIAS):  # ✅ Just written: a replica may not have it yet
+            row = _rows().filter(store_id=store_id).first()
+    return _snapshot(row)
+
+
+def queue_snapshots(store_ids=None):
+    """``{store_id: snapshot}`` for every store (or just ``store_ids``), in one query."""
+    rows = _rows() if store_ids is None else _rows().filter(store_id__in=store_ids)
+    return {row['store_id']: _snapshot(row) for row in rows}
+
+
+def reconcile(store_ids, dry_run=False):
+    """Recount each store's queue from PrintOrder; return ``{store_id: (stored, actual)}`` for those that drifted."""
+    drifted = {}
+    for store_id in store_ids:
+        with transaction.atomic():
+            # ✅ Row lock: concurrent F() updates wait, so the recount and the write agree
+            stats, _ = StoreQueueStats.objects.select_for_update().get_or_create(store_id=store_id)
+            actual = dict.fromkeys(COUNTER_FIELDS, 0)
+            rows = (
+                PrintOrder.objects.filter(store_id=store_id, status__in=QUEUED_STATUSES)
+                .values('status')
+                .annotate(jobs=Count('id'), pages=Sum(F('num_pages') * F('num_copies')))
+            )
+            for row in rows:
+                actual[f"{row['status']}_jobs"] = row['jobs']
+                actual[f"{row['status']}_pages"] = row['pages'] or 0
+            stored = {field: getattr(stats, field) for field in COUNTER_FIELDS}
+            if stored != actual:
+                drifted[store_id] = (stored, actual)
+                if not dry_run:
+                    StoreQueueStats.objects.filter(store_id=store_id).update(**actual, updated_at=timezone.now())
+    return drifted
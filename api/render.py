@@ -0,0 +1,60 @@
+"""PyMuPDF rendering that runs inside :mod:`api.isolation` worker processes.
+
+Nothing here touches Django: workers get file paths in and write file paths out.
+"""
+import fitz  # PyMuPDF
+
+# Points (1/72 inch), portrait
+PAGE_SIZES = {'A4': (595, 842), 'A3': (842, 1191)}
+
+
+def _open_as_pdf(source):
+    doc = fitz.open(source)
+    if doc.is_pdf:
+        return doc
+    # ✅ Images, XPS, EPUB... become a PDF so every page can be placed and recoloured
+    try:
+        return fitz.open('pdf', doc.convert_to_pdf())
+    finally:
+        doc.close()
+
+
+def render_print(source, dest, page_size, print_type):
+    """Write a print-ready PDF: every page fitted to ``page_size``, greyscale for ``black_white``."""
+    width, height = PAGE_SIZES[page_size]
+    with _open_as_pdf(source) as src, fitz.open() as out:
+        if print_type == 'black_white':
+            for page in src:
+                page.recolor(1)  # ✅ Vector greyscale; text and line art stay sharp
+        for page in src:
+            landscape = page.rect.width > page.rect.height
+            target = out.new_page(width=height if landscape else width, height=width if landscape else height)
+            target.show_pdf_page(target.rect, src, page.number, keep_proportion=True)
+        out.save(dest, garbage=3, deflate=True)
+
+
+def render_thumbnail(source, dest, width):
+    """First page as a PNG ``width`` pixels wide."""
+    with fitz.open(source) as doc:
+        page = doc[0]
+        zoom = width / page.rect.width
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        pixmap.save(dest, output='png')
+
+
+def render_outputs(source, outputs):
+    """Render each ``(dest, kind, options)`` in ``outputs``; return ``{dest: error or None}``.
+
+    One bad output (e.g. a page PyMuPDF can't recolour) doesn't lose the others.
+    """
+    results = {}
+    for dest, kind, options in outputs:
+        try:
+            if kind == 'print':
+                render_print(source, dest, options['page_size'], options['print_type'])
+            else:
+                render_thumbnail(source, dest, options['width'])
+            results[dest] = None
+        except Exception as e:
+            results[dest] = f"{type(e).__name__}: {e}"
+    return results
@@ -0,0 +1,36 @@
+"""JSON renderer backed by orjson when it is installed.
+
+Produces JSON equivalent to DRF's ``JSONRenderer`` for API data (compact
+separators, UTF-8, escaped U+2028/U+2029, the same encoding of datetimes,
+Decimals and so on), just faster. It isn't byte-identical: floats use
+orjson's formatting (``1e-05`` comes out as ``0.00001``, ``1e+16`` as
+``1e16``), which parses to the same number, and NaN/Infinity render as
+``null`` instead of raising. Without orjson, or when a client asks for indented output, it is DRF's
+renderer unchanged.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # ✅ Optional dependency
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _default(value):
+    return _encoder.default(value)  # ✅ Datetimes, Decimals, lazy strings... exactly as DRF encodes them
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # e.g. non-str dict keys or ints beyond 64 bits, which orjson rejects
+            return super().render(data, accepted_media_type, renderer_context)
+        # ✅ Same as DRF: these are valid JSON but break JavaScript string literals
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
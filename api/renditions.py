@@ -0,0 +1,231 @@
+"""Print-ready renditions and thumbnails, cached on disk by document content.
+
+Artifacts are keyed by the document's SHA-256 (plus page size and print
+type for print files), so every order for the same file shares them. The
+cache is bounded by ``ARTIFACT_CACHE_MAX_BYTES``; the least recently used
+files (by mtime, bumped on every hit) are evicted first. Rendering runs in
+isolated PyMuPDF worker processes (:mod:`api.render`).
+"""
+import os
+import tempfile
+import threading
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from .isolation import IsolatedPool
+from .models import Document, PrintOrder
+from .render import render_outputs
+from .storage import get_storage
+
+ACTIVE_STATUSES = ('pending', 'printing')  # ✅ Orders a store agent may still fetch
+
+
+class RenditionError(Exception):
+    """A document could not be fetched or one of its artifacts could not be rendered."""
+
+
+class ArtifactCache:
+    """A directory of rendered files, trimmed to ``max_bytes`` in LRU order."""
+
+    def __init__(self, root, max_bytes):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """Path of a cached artifact (marking it recently used), or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def temp_path(self, key):
+        """A private path next to ``key`` to render into before :meth:`commit`."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def commit(self, temp_path, key):
+        os.replace(temp_path, self.path(key))  # ✅ Atomic: readers never see half a file
+
+    def evict(self, keep=()):
+        """Delete least recently used artifacts until the cache fits in ``max_bytes``.
+
+        ``keep`` (cache keys) are never deleted, even if that leaves the cache
+        over its limit: they were just rendered and are about to be served.
+        """
+        keep = {self.path(key) for key in keep}
+        with self._evict_lock:
+            entries = []
+            total = 0
+            for dirpath, _, names in os.walk(self.root):
+                for name in names:
+                    path = os.path.join(dirpath, name)
+                    if name.endswith('.tmp') or path in keep:
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+@lru_cache(maxsize=None)
+def get_artifact_cache():
+    return ArtifactCache(settings.ARTIFACT_CACHE_DIR, settings.ARTIFACT_CACHE_MAX_BYTES)
+
+
+@receiver(setting_changed)
+def reset_artifact_cache(setting, **kwargs):
+    if setting in ('ARTIFACT_CACHE_DIR', 'ARTIFACT_CACHE_MAX_BYTES'):
+        get_artifact_cache.cache_clear()
+
+
+def print_key(sha256, page_size, print_type):
+    return f"print/{sha256[:2]}/{sha256}-{page_size}-{print_type}.pdf"
+
+
+def thumbnail_key(sha256):
+    return f"thumbnails/{sha256[:2]}/{sha256}.png"
+
+
+def artifact_keys(sha256, variants=(), thumbnail=False, **kwargs):
+    """Cache keys :func:`render_document` writes for these arguments."""
+    keys = {print_key(sha256, page_size, print_type) for page_size, print_type in variants}
+    return keys | {thumbnail_key(sha256)} if thumbnail else keys
+
+
+render_pool = IsolatedPool('RENDER_WORKERS', 'RENDER_TIMEOUT', 'RENDER_MEMORY_LIMIT_MB')
+
+
+def render_document(sha256, file_url, file_name, variants=(), thumbnail=False):
+    """Fetch a document once and render its ``(page_size, print_type)`` variants and/or thumbnail.
+
+    Artifacts that render are cached even if others fail; any failure is
+    then raised as :class:`RenditionError`. Returns ``{cache key: path}``
+    for the artifacts written.
+    """
+    cache = get_artifact_cache()
+    wanted = [
+        (print_key(sha256, page_size, print_type), 'print', {'page_size': page_size, 'print_type': print_type})
+        for page_size, print_type in variants
+    ]
+    if thumbnail:
+        wanted.append((thumbnail_key(sha256), 'thumbnail', {'width': settings.THUMBNAIL_WIDTH}))
+    if not wanted:
+        return {}
+    keys = {cache.temp_path(key): key for key, _, _ in wanted}  # temp path -> cache key
+    outputs = [(temp_path, kind, options) for temp_path, (_, kind, options) in zip(keys, wanted)]
+
+    fd, source = tempfile.mkstemp(suffix=os.path.splitext(file_name)[1])
+    os.close(fd)
+    try:
+        get_storage().fetch(file_url, source)
+        if render_pool.enabled:
+            results = render_pool.run(render_outputs, source, outputs)
+        else:
+            results = render_outputs(source, outputs)  # ✅ Inline mode (tests, one-off scripts)
+    except Exception as e:
+        for temp_path in keys:
+            _discard(temp_path)
+        raise RenditionError(f"{sha256[:12]}: {e}") from e
+    finally:
+        _discard(source)
+
+    errors = []
+    written = {}
+    for temp_path, error in results.items():
+        if error:
+            errors.append(f"{keys[temp_path]}: {error}")
+            _discard(temp_path)
+        else:
+            cache.commit(temp_path, keys[temp_path])
+            written[keys[temp_path]] = cache.path(keys[temp_path])
+    cache.evict(keep=written)  # ✅ A cache smaller than one document's artifacts mustn't delete them right away
+    if errors:
+        raise RenditionError('; '.join(errors))
+    return written
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def missing_renditions(since_document_id):
+    """Work for the render pipeline and the new high-water document id.
+
+    Print files are wanted for every document in the active queue, in the
+    page size and print type each order asked for; thumbnails for those
+    documents and for every document created after ``since_document_id``.
+    Returns ``({sha256: render_document kwargs}, last_document_id)``.
+    """
+    cache = get_artifact_cache()
+    work = {}
+
+    def entry(sha256, file_url, file_name):
+        if sha256 not in work:
+            work[sha256] = {
+                'file_url': file_url,
+                'file_name': file_name,
+                'variants': set(),
+                'thumbnail': cache.get(thumbnail_key(sha256)) is None,
+            }
+        return work[sha256]
+
+    active = (
+        PrintOrder.objects.filter(status__in=ACTIVE_STATUSES, document__isnull=False)
+        .values_list('document__sha256', 'document__file_url', 'document__file_name', 'page_size', 'print_type')
+        .distinct()
+    )
+    for sha256, file_url, file_name, page_size, print_type in active:
+        item = entry(sha256, file_url, file_name)
+        if cache.get(print_key(sha256, page_size, print_type)) is None:
+            item['variants'].add((page_size, print_type))
+
+    last_id = since_document_id
+    new_documents = (
+        Document.objects.filter(id__gt=since_document_id)
+        .order_by('id')
+        .values_list('id', 'sha256', 'file_url', 'file_name')[:settings.RENDER_BATCH_SIZE]
+    )
+    for last_id, sha256, file_url, file_name in new_documents:
+        entry(sha256, file_url, file_name)
+
+    return {sha256: item for sha256, item in work.items() if item['variants'] or item['thumbnail']}, last_id
+
+
+def ensure_thumbnail(document):
+    """Cached thumbnail path for ``document``, rendering it now on a miss.
+
+    Raises :class:`RenditionError` when the document can't be previewed.
+    """
+    cache = get_artifact_cache()
+    key = thumbnail_key(document.sha256)
+    path = cache.get(key)
+    if path is None:
+        # ✅ Straight from the render: no second lookup that an eviction could turn into None
+        path = render_document(document.sha256, document.file_url, document.file_name, thumbnail=True)[key]
+    return path
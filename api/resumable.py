@@ -0,0 +1,132 @@
+"""Resumable uploads: open a session, PUT fixed-size chunks in any order, finalize.
+
+Each session owns one preallocated part file under ``UPLOAD_SESSION_DIR``.
+Chunks are streamed from the request body straight to their offset with
+``pwrite``, so parallel PUTs never contend and finalizing needs no
+assembly pass: the part file already is the document.
+"""
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import UploadChunk, UploadSession
+from .uploads import COPY_BUFFER_SIZE
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class ChunkError(Exception):
+    """A chunk doesn't line up with its session (offset, length or total size)."""
+
+
+def part_path(session):
+    return os.path.join(str(settings.UPLOAD_SESSION_DIR), f"{session.id}.part")
+
+
+def create_session(**fields):
+    """Create a session and a sparse part file of the announced size."""
+    session = UploadSession.objects.create(
+        expires_at=timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL), **fields
+    )
+    os.makedirs(str(settings.UPLOAD_SESSION_DIR), exist_ok=True)
+    with open(part_path(session), 'wb') as f:
+        f.truncate(session.size)
+    return session
+
+
+def parse_range(content_range, offset_param, content_length, total_size):
+    """``(offset, length)`` from ``Content-Range: bytes a-b/total`` or ``?offset=`` + Content-Length."""
+    if content_range:
+        match = CONTENT_RANGE.match(content_range.strip())
+        if not match:
+            raise ChunkError("Content-Range must look like 'bytes <start>-<end>/<total>'")
+        start, end, total = match.groups()
+        if total != '*' and int(total) != total_size:
+            raise ChunkError(f"Content-Range total {total} does not match the session size {total_size}")
+        offset, length = int(start), int(end) - int(start) + 1
+        if content_length is not None and content_length != length:
+            raise ChunkError("Content-Range and Content-Length disagree")
+        return offset, length
+    if offset_param is None or content_length is None:
+        raise ChunkError("Send Content-Range, or ?offset= with a Content-Length")
+    try:
+        return int(offset_param), content_length
+    except ValueError:
+        raise ChunkError("offset must be an integer")
+
+
+def _pwrite_all(fd, data, offset):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def write_chunk(session, offset, length, stream):
+    """Copy ``length`` bytes from ``stream`` to ``offset`` in the part file and record the chunk.
+
+    Re-sending a chunk overwrites it with the same bytes, so retries are safe.
+    """
+    if offset < 0 or offset >= session.size or offset % session.chunk_size:
+        raise ChunkError(f"offset must be a multiple of {session.chunk_size} below {session.size}")
+    index = offset // session.chunk_size
+    expected = min(session.chunk_size, session.size - offset)
+    if length != expected:
+        raise ChunkError(f"Chunk {index} must be {expected} bytes, got {length}")
+
+    received = 0
+    fd = os.open(part_path(session), os.O_WRONLY)
+    try:
+        while received < length:
+            block = stream.read(min(COPY_BUFFER_SIZE, length - received))
+            if not block:
+                break
+            _pwrite_all(fd, block, offset + received)
+            received += len(block)
+    finally:
+        os.close(fd)
+    if received != length:
+        # ✅ Connection dropped mid-chunk: nothing is recorded, the client re-sends it
+        raise ChunkError(f"Chunk {index} ended after {received} of {length} bytes")
+
+    UploadChunk.objects.get_or_create(session=session, index=index, defaults={'size': length})
+    UploadSession.objects.filter(id=session.id).update(
+        expires_at=timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+    )
+    return index
+
+
+def progress(session):
+    """Bytes received and the chunk offsets still missing."""
+    chunks = UploadChunk.objects.filter(session=session)
+    received = set(chunks.values_list('index', flat=True))
+    return {
+        'session_id': str(session.id),
+        'status': session.status,
+        'size': session.size,
+        'chunk_size': session.chunk_size,
+        'num_chunks': session.num_chunks,
+        'received_bytes': chunks.aggregate(total=Sum('size'))['total'] or 0,
+        'missing_offsets': [
+            index * session.chunk_size for index in range(session.num_chunks) if index not in received
+        ],
+        'order_id': session.order_id,
+        'expires_at': session.expires_at,
+    }
+
+
+def begin_finalize(session):
+    """Move an open session to ``finalizing``; False if another request got there first."""
+    return UploadSession.objects.filter(id=session.id, status='open').update(status='finalizing') == 1
+
+
+def discard_part(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,157 @@
+"""Send reads from read-only endpoints to replica databases.
+
+Views opt in with :func:`replica_reads` (placed under ``@api_view`` so
+the request is already authenticated). Everything else, and every write,
+goes to ``default``. Users who just wrote something are pinned to the
+primary for ``REPLICA_PIN_SECONDS`` (see
+:class:`api.middleware.ReplicaPinMiddleware`) so they read their own writes.
+Replicas that fail a health check, or lag more than
+``REPLICA_MAX_LAG_SECONDS``, are skipped until the next check.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+_replica = ContextVar('replica', default=None)  # ✅ Alias chosen for the current request
+_health = {}  # alias -> (checked_at, healthy)
+_health_lock = threading.Lock()
+
+
+def replica_aliases():
+    return settings.DATABASE_REPLICAS
+
+
+def _check(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            if connections[alias].vendor == 'postgresql':
+                # ✅ NULL on a primary or an idle replica that is fully caught up
+                cursor.execute("SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())")
+                lag = cursor.fetchone()[0]
+                if lag is not None and lag > settings.REPLICA_MAX_LAG_SECONDS:
+                    logger.warning("Replica %s is %.1fs behind; reading from the primary", alias, lag)
+                    return False
+            else:
+                cursor.execute("SELECT 1")
+        return True
+    except DatabaseError as e:
+        logger.warning("Replica %s is unavailable: %s", alias, e)
+        return False
+
+
+def is_healthy(alias):
+    """Cached health of ``alias``, re-checked every ``REPLICA_HEALTH_CHECK_INTERVAL`` seconds."""
+    now = time.monotonic()
+    checked_at, healthy = _health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        return healthy
+    healthy = _check(alias)
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def mark_unhealthy(alias):
+    with _health_lock:
+        _health[alias] = (time.monotonic(), False)
+
+
+def pick_replica():
+    """A healthy replica alias, or None to read from the primary."""
+    healthy = [alias for alias in replica_aliases() if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica.get()  # None: default routing (the primary)
+
+    def db_for_write(self, model, **hints):
+        # ✅ Explicit: objects read from a replica must still save to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Every alias holds the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS  # ✅ Replicas get schema changes through replication
+
+
+# ----------------------------------------------------------------------
+# Read-your-writes pins
+# ----------------------------------------------------------------------
+
+def _pin_key(user_id):
+    return f"db:pin-primary:{user_id}"
+
+
+def pin_to_primary(user_id):
+    caches[settings.REPLICA_PIN_CACHE_ALIAS].set(_pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(caches[settings.REPLICA_PIN_CACHE_ALIAS].get(_pin_key(user_id)))
+
+
+def check_pin_cache():
+    """Warn at startup when replicas are on but pins only live in this process's memory."""
+    if replica_aliases() and settings.REPLICA_PIN_CACHE_ALIAS != 'shared':
+        logger.warning(
+            "Read replicas without REDIS_URL: read-your-writes pins are per-process, so a user's next request "
+            "on another worker may read from a replica that hasn't caught up"
+        )
+
+
+@contextmanager
+def reading_from(alias):
+    token = _replica.set(alias)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def _stream_from(alias, content):
+    with reading_from(alias):
+        yield from content
+
+
+def replica_reads(view):
+    """Run a read-only view against a replica, unless the user is pinned to the primary.
+
+    A replica that errors mid-request is marked unhealthy and the view is
+    re-run once on the primary (safe: the view only reads).
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user_id = getattr(request.user, 'id', None)
+        if not replica_aliases() or (user_id is not None and is_pinned(user_id)):
+            return view(request, *args, **kwargs)
+        alias = pick_replica()  # ✅ One replica per request: pages come from one consistent snapshot
+        if alias is None:
+            return view(request, *args, **kwargs)
+
+        try:
+            with reading_from(alias):
+                response = view(request, *args, **kwargs)
+        except DatabaseError as e:
+            mark_unhealthy(alias)
+            logger.warning("Read from replica %s failed (%s); retrying on the primary", alias, e)
+            return view(request, *args, **kwargs)
+
+        if isinstance(response, StreamingHttpResponse):
+            # ✅ Streamed bodies run their queries after the view returns
+            response.streaming_content = _stream_from(alias, response.streaming_content)
+        return response
+    return wrapper
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from .models import PrintOrder, Store  
 from django.contrib.auth.models import User
@@ -14,19 +16,59 @@ class UserSerializer(serializers.ModelSerializer):
 class StoreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Store
-        fields = ['id', 'name', 'location', 'contact']
+        fields = ['id', 'name', 'location', 'contact', 'latitude', 'longitude']
 
 
 # ✅ Print Order Serializer
 class PrintOrderSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)  # ✅ Nested User Data
     store = StoreSerializer(read_only=True)  # ✅ Nested Store Data
+    file_path = serializers.CharField(source='file_url', read_only=True)  # ✅ Resolved from the shared document
 
     class Meta:
         model = PrintOrder
         fields = [
             'id', 'user', 'store', 'file_name', 'file_path', 
             'page_size', 'num_copies', 'print_type', 'num_pages', 
-            'status', 'uploaded_at'
+            'status', 'version', 'uploaded_at'
         ]  # ✅ Explicitly listed fields
 
+
+
+# ✅ Fast read path for order listings: same output as PrintOrderSerializer, built from values() rows
+# (no model instances or per-row field objects). Works on PrintOrder and ArchivedPrintOrder querysets.
+ORDER_FIELDS = PrintOrderSerializer.Meta.fields
+USER_FIELDS = UserSerializer.Meta.fields
+STORE_FIELDS = StoreSerializer.Meta.fields
+ORDER_VALUES = (
+    [field for field in ORDER_FIELDS if field not in ('user', 'store', 'file_path')]
+    + [f'user__{field}' for field in USER_FIELDS]
+    + ['store_id'] + [f'store__{field}' for field in STORE_FIELDS if field != 'id']
+    + ['document_id', 'document__file_url', 'file_path']
+)
+
+
+def order_values(queryset):
+    """``queryset`` as the dict rows :func:`serialize_order_rows` expects (one joined query)."""
+    return queryset.values(*ORDER_VALUES)
+
+
+def serialize_order_rows(rows):
+    """Dicts identical to ``PrintOrderSerializer(orders, many=True).data`` for ``order_values()`` rows."""
+    # ✅ DRF's own datetime formatting, with the current timezone looked up once instead of per row
+    format_datetime = serializers.DateTimeField(
+        default_timezone=timezone.get_current_timezone() if settings.USE_TZ else None,
+    ).to_representation
+    data = []
+    for row in rows:
+        store_id = row['store_id']
+        derived = {
+            'user': {field: row[f'user__{field}'] for field in USER_FIELDS},
+            'store': None if store_id is None else {
+                field: store_id if field == 'id' else row[f'store__{field}'] for field in STORE_FIELDS
+            },
+            'file_path': row['document__file_url'] if row['document_id'] else row['file_path'],
+            'uploaded_at': format_datetime(row['uploaded_at']) if row['uploaded_at'] else None,
+        }
+        data.append({field: derived[field] if field in derived else row[field] for field in ORDER_FIELDS})
+    return data
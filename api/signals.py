@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import auth, pricing, stores
+from .queue_stats import record_transitions, release_queued, sheets
+from .events import order_event, publish_order_events
+from .models import PriceRule, PrintOrder, Store, StoreQueueStats
+
+
+# ✅ Any change to a store invalidates the cached store directory
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_store_cache(sender, **kwargs):
+    stores.invalidate()
+
+
+# ✅ Every store starts with an (empty) queue counter row
+@receiver(post_save, sender=Store)
+def create_queue_stats(sender, instance, created, **kwargs):
+    if created:
+        StoreQueueStats.objects.get_or_create(store=instance)
+
+
+# ✅ Price changes invalidate the in-memory price table
+@receiver(post_save, sender=PriceRule)
+@receiver(post_delete, sender=PriceRule)
+def invalidate_price_cache(sender, **kwargs):
+    pricing.invalidate()
+
+
+# ✅ Push order status transitions to live subscribers (user + store channels) and the store queue counters
+@receiver(post_save, sender=PrintOrder)
+def publish_order_status(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields is not None and 'status' not in update_fields:
+        return
+    previous = getattr(instance, '_loaded_status', None)
+    if created or instance.status != previous:
+        publish_order_events([order_event(
+            instance.id, instance.user_id, instance.store_id, instance.status, None if created else previous,
+        )])
+        record_transitions([(instance.store_id, sheets(instance), None if created else previous, instance.status)])
+    instance._loaded_status = instance.status
+
+
+# ✅ A deleted user's queued orders leave the store queue counters (the cascade itself sends no signals)
+@receiver(pre_delete, sender=User)
+def release_user_orders(sender, instance, **kwargs):
+    release_queued(PrintOrder.objects.filter(user_id=instance.pk))
+
+
+# ✅ A password change (set_password + save) revokes every token issued with the old one
+@receiver(post_save, sender=User)
+def revoke_tokens_on_password_change(sender, instance, created, **kwargs):
+    if not created and getattr(instance, '_password', None) is not None:
+        auth.revoke_user_tokens(instance.pk)
+
+
+# ✅ Deactivation / staff changes reach CachedJWTAuthentication right away
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    auth.forget_user(instance.pk)
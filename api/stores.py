@@ -0,0 +1,135 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .cache import LRUCache
+from .models import Store, StoreDirectoryVersion
+from .routers import reading_from
+from .serializers import StoreSerializer
+
+VERSION_KEY = 'stores:version'
+
+# ✅ Tier 1: per-process LRU. Tier 2 (optional): the STORE_CACHE_ALIAS Django cache.
+_local = LRUCache(maxsize=settings.STORE_CACHE_SIZE, ttl=settings.STORE_CACHE_TTL)
+_version = LRUCache(maxsize=1, ttl=settings.STORE_VERSION_TTL)
+
+
+def _shared():
+    alias = settings.STORE_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def _stored_version():
+    """The version row from the primary, created on first use."""
+    with reading_from(DEFAULT_DB_ALIAS):
+        version = StoreDirectoryVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    if version is None:
+        version = StoreDirectoryVersion.objects.get_or_create(pk=1, defaults={'version': _new_version()})[0].version
+    return version
+
+
+def current_version():
+    """Version of the store directory; changes whenever a store is saved or deleted.
+
+    The version is stored in the database (:class:`~api.models.StoreDirectoryVersion`),
+    so every process agrees on it and it only changes with the data. Processes
+    re-read it at most every ``STORE_VERSION_TTL`` seconds, through the shared
+    tier when there is one.
+    """
+    shared = _shared()
+    if shared is not None:
+        version = shared.get(VERSION_KEY)
+        if version is None:
+            version = _stored_version()
+            shared.set(VERSION_KEY, version, settings.STORE_VERSION_TTL)
+        return version
+
+    version = _version.get(VERSION_KEY)
+    if version is None:
+        version = _stored_version()
+        _version.set(VERSION_KEY, version)
+    return version
+
+
+def _forget():
+    _version.clear()
+    _local.clear()
+    shared = _shared()
+    if shared is not None:
+        shared.delete(VERSION_KEY)
+
+
+def invalidate():
+    """Bump the stored version (called from the Store save/delete signals)."""
+    # ✅ Never backwards, even if this server's clock is behind the last writer's
+    bumped = StoreDirectoryVersion.objects.filter(pk=1).update(
+        version=Greatest(F('version') + 1, Value(_new_version())),
+    )
+    if not bumped:
+        StoreDirectoryVersion.objects.get_or_create(pk=1, defaults={'version': _new_version()})
+    # ✅ Now for this process, and again once committed: a reader in between may have re-cached the old version
+    _forget()
+    transaction.on_commit(_forget)
+
+
+def _cached(key, load):
+    version = current_version()
+    entry = _local.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    shared = _shared()
+    shared_key = f'stores:{version}:{key}'
+    value = shared.get(shared_key) if shared is not None else None
+    if value is None:
+        with reading_from(DEFAULT_DB_ALIAS):  # ✅ Cached under the current version: never fill it from a lagging replica
+            value = load()
+        if shared is not None:
+            shared.set(shared_key, value, settings.STORE_CACHE_TTL)
+    _local.set(key, (version, value))
+    return value
+
+
+def store_listing():
+    """Serialized store directory (list of dicts), served from cache."""
+    return _cached('listing', lambda: [
+        dict(store) for store in StoreSerializer(Store.objects.order_by('id'), many=True).data
+    ])
+
+
+def get_store(store_id):
+    """Cached ``Store.objects.get(id=store_id)``; raises ``Store.DoesNotExist``."""
+    if not str(store_id).isdigit():
+        raise Store.DoesNotExist
+    # ✅ Misses are cached too (as False) so bad ids don't hit the database every time
+    store = _cached(f'store:{int(store_id)}', lambda: Store.objects.filter(id=int(store_id)).first() or False)
+    if store is False:
+        raise Store.DoesNotExist
+    return store
+
+
+def wants_queue(request):
+    """``?include_queue=1``: add live queue counters to the store listing."""
+    return request.GET.get('include_queue') in ('1', 'true')
+
+
+def listing_etag(request):
+    if wants_queue(request):
+        return None  # ✅ Queue counters aren't covered by the store version
+    return f'stores-{current_version()}'
+
+
+def listing_last_modified(request):
+    if wants_queue(request):
+        return None
+    # ✅ Versions are microsecond timestamps of the last change
+    return datetime.fromtimestamp(current_version() / 1_000_000, tz=timezone.utc)
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .auth import CachedJWTAuthentication
+from .events import get_broker
+
+
+def _authenticate(request):
+    """Resolve the JWT from the Authorization header or ``?token=`` (EventSource can't send headers)."""
+    authenticator = CachedJWTAuthentication()
+    raw_token = None
+    header = authenticator.get_header(request)
+    if header is not None:
+        raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        raw_token = request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        return authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _event_stream(channel):
+    """Server-Sent Events response relaying ``channel`` until the client disconnects."""
+
+    async def stream():
+        subscription = get_broker().subscribe(channel)
+        try:
+            yield f"retry: {settings.EVENT_RETRY_MS}\n\n"
+            event_id = 0
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # ✅ Keeps proxies from closing an idle stream
+                    continue
+                event_id += 1
+                yield f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # ✅ Disable nginx buffering
+    return response
+
+
+# ✅ Live status changes for the signed-in user's orders (serve with an ASGI server)
+async def order_events(request):
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    return _event_stream(f"user:{user.id}")
+
+
+# ✅ Live queue changes for one store (staff only)
+async def store_events(request, store_id):
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    if not user.is_staff:
+        return JsonResponse({'error': 'You do not have permission to perform this action.'}, status=403)
+    return _event_stream(f"store:{store_id}")
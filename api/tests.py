@@ -1,3 +1,859 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models.functions import Coalesce
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from . import metrics, routers, stores
+from .archive import archive_batch, archive_cutoff
+from .auth import tokens_for_user
+from .bench import make_pdf
+from .events import RedisBroker, get_broker
+from .idempotency import REPLAY_HEADER, run_idempotent
+from .jobs import claim_job, run_job
+from .middleware import ReplicaPinMiddleware
+from .models import (
+    ArchivedPrintOrder, Document, IdempotencyRecord, PrintOrder, Store, StoreQueueStats, UploadJob,
+)
+from .queue import claim_jobs, claimable, complete_jobs, renew_lease
+from .queue_stats import COUNTER_FIELDS, queue_snapshot, reconcile
+from .renderers import FastJSONRenderer
+from .renditions import ensure_thumbnail
+from .serializers import PrintOrderSerializer, order_values, serialize_order_rows
+from .storage import get_storage
+from .transitions import transition_orders
+from .uploads import PageCountError, StorageError
+
+# ✅ Big enough that the planner prefers an index over scanning the table
+NUM_USERS = 200
+NUM_STORES = 20
+NUM_ORDERS = 20000
+STATUSES = ['pending'] * 1 + ['printing'] * 1 + ['completed'] * 18
+
+
+class QueryPlanTests(TestCase):
+    """Hot queries must keep using index scans as the order table grows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(NUM_USERS)
+        ])
+        Store.objects.bulk_create([
+            Store(name=f'Store {i}', location='Campus', contact='000') for i in range(NUM_STORES)
+        ])
+        cls.users = list(User.objects.values_list('id', flat=True))
+        cls.stores = list(Store.objects.values_list('id', flat=True))
+        PrintOrder.objects.bulk_create([
+            PrintOrder(
+                user_id=rng.choice(cls.users),
+                store_id=rng.choice(cls.stores),
+                file_name=f'doc{i}',
+                page_size=rng.choice(['A4', 'A3']),
+                print_type=rng.choice(['black_white', 'color']),
+                num_pages=rng.randint(1, 50),
+                status=rng.choice(STATUSES),
+            )
+            for i in range(NUM_ORDERS)
+        ], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, table='api_printorder'):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan, plan)
+            self.assertIn('Index', plan, plan)
+        elif connection.vendor == 'sqlite':
+            # SQLite reports "SEARCH <table> USING ... INDEX" vs. a bare "SCAN <table>"
+            self.assertNotRegex(plan, rf'SCAN {table}(?! USING)', plan)
+        else:
+            self.skipTest(f'No plan assertions for {connection.vendor}')
+
+    def test_orders_for_user(self):
+        self.assertUsesIndex(PrintOrder.objects.filter(user_id=self.users[0]).order_by('-id')[:50])
+
+    def test_orders_for_user_next_page(self):
+        self.assertUsesIndex(
+            PrintOrder.objects.filter(user_id=self.users[0], id__lt=NUM_ORDERS // 2).order_by('-id')[:50]
+        )
+
+    def test_store_orders_by_status_and_date(self):
+        since = timezone.now() - timedelta(days=7)
+        self.assertUsesIndex(
+            PrintOrder.objects.filter(store_id=self.stores[0], status='completed', uploaded_at__gte=since)
+        )
+
+    def test_store_pending_queue(self):
+        self.assertUsesIndex(
+            PrintOrder.objects.filter(store_id=self.stores[0], status='pending').order_by('id')[:10]
+        )
+
+    def test_store_claimable_jobs(self):
+        self.assertUsesIndex(claimable(self.stores[0], timezone.now()).order_by('id')[:10])
+
+    def test_archivable_orders(self):
+        cutoff = timezone.now() - timedelta(days=90)
+        self.assertUsesIndex(
+            PrintOrder.objects.alias(aged_from=Coalesce('completed_at', 'uploaded_at'))
+            .filter(status='completed', aged_from__lt=cutoff).order_by('aged_from')[:1000]
+        )
+
+    def test_user_by_email(self):
+        self.assertUsesIndex(User.objects.filter(email='user7@example.com'), table='auth_user')
+
+
+class QueueStatsTests(TestCase):
+    """Store queue counters follow every order create, status change and delete."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('queue', 'queue@example.com', 'pw')
+        self.store = Store.objects.create(name='Queue Store', location='Campus', contact='000', pages_per_minute=10)
+
+    def order(self, num_pages, num_copies=1, status='pending'):
+        return PrintOrder.objects.create(
+            user=self.user, store=self.store, file_name='doc', num_pages=num_pages, num_copies=num_copies, status=status,
+        )
+
+    def counters(self):
+        snapshot = queue_snapshot(self.store.id)
+        return tuple(snapshot[field] for field in COUNTER_FIELDS)
+
+    def test_new_store_has_empty_counters(self):
+        self.assertEqual(self.counters(), (0, 0, 0, 0))
+
+    def test_bulk_created_store_gets_counters_on_first_read(self):
+        store = Store.objects.bulk_create([Store(name='Bulk', location='Campus', contact='000')])[0]
+        PrintOrder.objects.bulk_create([
+            PrintOrder(user=self.user, store=store, file_name='doc', num_pages=2, num_copies=3, status='pending'),
+        ])
+        self.assertFalse(StoreQueueStats.objects.filter(store_id=store.id).exists())
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        response = client.get(f'/api/stores/{store.id}/queue/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['pending_jobs'], response.data['pending_pages']), (1, 6))
+        self.assertEqual(client.get('/api/stores/999999/queue/').status_code, 404)
+
+    def test_create_and_save(self):
+        self.order(3, num_copies=2)
+        processing = self.order(5, status='processing')
+        self.assertEqual(self.counters(), (1, 6, 0, 0))
+
+        processing.status = 'pending'
+        processing.save(update_fields=['status'])
+        self.assertEqual(self.counters(), (2, 11, 0, 0))
+
+    def test_claim_and_complete(self):
+        first, second = self.order(3), self.order(4)
+        orders, _ = claim_jobs(self.store.id, 'agent', 10, 60)
+        self.assertEqual(self.counters(), (0, 0, 2, 7))
+
+        # ✅ Re-claiming an expired lease keeps the job counted once, as printing
+        PrintOrder.objects.filter(id=first.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        claim_jobs(self.store.id, 'agent-2', 10, 60)
+        self.assertEqual(self.counters(), (0, 0, 2, 7))
+
+        complete_jobs(self.store.id, 'agent', [second.id])
+        self.assertEqual(self.counters(), (0, 0, 1, 3))
+
+    def test_deletes(self):
+        self.order(3)
+        doomed = self.order(4)
+        doomed.delete()
+        self.assertEqual(self.counters(), (1, 3, 0, 0))
+
+        PrintOrder.objects.filter(store=self.store).delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0))
+
+        self.order(2)
+        self.user.delete()  # ✅ Cascade
+        self.assertEqual(self.counters(), (0, 0, 0, 0))
+
+    def test_estimated_wait(self):
+        self.order(10)
+        self.order(5, num_copies=2)
+        self.assertEqual(queue_snapshot(self.store.id)['estimated_wait_seconds'], 120)  # 20 pages at 10/min
+
+    def test_reconcile_repairs_drift(self):
+        self.order(3)
+        self.order(4, status='printing')
+        StoreQueueStats.objects.filter(store=self.store).update(pending_jobs=9, printing_pages=-2)
+
+        drifted = reconcile([self.store.id], dry_run=True)
+        self.assertEqual(set(drifted), {self.store.id})
+        self.assertEqual(StoreQueueStats.objects.get(store=self.store).pending_jobs, 9)  # ✅ Dry run: untouched
+
+        reconcile([self.store.id])
+        self.assertEqual(self.counters(), (1, 3, 1, 4))
+        self.assertEqual(reconcile([self.store.id]), {})
+
+
+class TransitionTests(TestCase):
+    """Bulk transitions only move orders at the expected version along pending -> printing -> completed."""
+
+    def setUp(self):
+        user = User.objects.create_user('ops', 'ops@example.com', 'pw')
+        self.store = Store.objects.create(name='Ops Store', location='Campus', contact='000')
+        self.orders = [
+            PrintOrder.objects.create(user=user, store=self.store, file_name=f'doc{i}', num_pages=2, status='pending')
+            for i in range(3)
+        ]
+
+    def results(self, versions, status):
+        return {result['id']: result for result in transition_orders(versions, status, claimed_by='desk')}
+
+    def test_updated_conflict_invalid_and_not_found(self):
+        first, second, third = self.orders
+        results = self.results({first.id: 1, second.id: 5, third.id: 1, 999999: 1}, 'printing')
+        self.assertEqual(results[first.id], {'id': first.id, 'result': 'updated', 'status': 'printing', 'version': 2})
+        self.assertEqual(results[second.id]['result'], 'conflict')
+        self.assertEqual(results[second.id]['version'], 1)
+        self.assertEqual(results[999999], {'id': 999999, 'result': 'not_found'})
+
+        results = self.results({first.id: 2, second.id: 1}, 'completed')
+        self.assertEqual(results[first.id]['result'], 'updated')
+        self.assertEqual(results[second.id]['result'], 'invalid_transition')  # ✅ pending can't skip printing
+
+        self.assertEqual(
+            list(PrintOrder.objects.order_by('id').values_list('status', 'version')),
+            [('completed', 3), ('pending', 1), ('printing', 2)],
+        )
+        self.assertEqual(queue_snapshot(self.store.id)['pending_jobs'], 1)
+        self.assertEqual(queue_snapshot(self.store.id)['printing_jobs'], 1)
+
+    def test_printing_orders_are_leased(self):
+        order = self.orders[0]
+        self.results({order.id: 1}, 'printing')
+        order.refresh_from_db()
+        self.assertEqual(order.claimed_by, 'desk')
+        self.assertIsNotNone(order.lease_expires_at)
+        self.assertEqual(complete_jobs(self.store.id, 'desk', [order.id]), [order.id])
+
+    def test_abandoned_printing_orders_are_reclaimable(self):
+        order = self.orders[0]
+        self.results({order.id: 1}, 'printing')
+        PrintOrder.objects.filter(id=order.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        claimed, _ = claim_jobs(self.store.id, 'agent', 10, 60)
+        self.assertIn(order.id, [o.id for o in claimed])
+
+    def test_payment_only_completes_pending_orders(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.orders[0].user).access_token}')
+        pending, processing, failed = self.orders
+        PrintOrder.objects.filter(id=processing.id).update(status='processing')
+        PrintOrder.objects.filter(id=failed.id).update(status='failed')
+
+        for order, expected in ((processing, 'processing'), (failed, 'failed')):
+            response = client.post('/api/orders/payment/', {'order_id': order.id}, format='json')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(PrintOrder.objects.get(id=order.id).status, expected)
+
+        queued = queue_snapshot(self.store.id)['pending_jobs']
+        self.assertEqual(client.post('/api/orders/payment/', {'order_id': pending.id}, format='json').status_code, 200)
+        self.assertEqual(PrintOrder.objects.get(id=pending.id).status, 'completed')
+        self.assertEqual(queue_snapshot(self.store.id)['pending_jobs'], queued - 1)
+        self.assertEqual(client.post('/api/orders/payment/', {'order_id': pending.id}, format='json').status_code, 200)
+
+
+class IdempotencyTests(TestCase):
+    """Idempotency-Key records replay successes, reject reused keys and release failures."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('retry', 'retry@example.com', 'pw')
+        self.calls = 0
+
+    def handler(self, status_code=201):
+        def handle():
+            self.calls += 1
+            return Response({'order_id': self.calls, 'uploaded_at': timezone.now()}, status=status_code)
+        return handle
+
+    def run_key(self, key='key-1', fingerprint='a' * 64, status_code=201):
+        return run_idempotent('upload', self.user.id, key, fingerprint, self.handler(status_code))
+
+    def test_replay(self):
+        first = self.run_key()
+        replay = self.run_key()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay[REPLAY_HEADER], 'true')
+        self.assertEqual(replay.data['order_id'], first.data['order_id'])
+        self.assertEqual(IdempotencyRecord.objects.get().state, 'done')
+
+    def test_fingerprint_mismatch(self):
+        self.run_key()
+        response = self.run_key(fingerprint='b' * 64)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_error_releases_key(self):
+        self.assertEqual(self.run_key(status_code=500).status_code, 500)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertEqual(self.run_key().status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+    def test_exception_releases_key(self):
+        def crash():
+            raise RuntimeError("storage down")
+        with self.assertRaises(RuntimeError):
+            run_idempotent('upload', self.user.id, 'key-1', 'a' * 64, crash)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def test_abandoned_claim_is_taken_over(self):
+        IdempotencyRecord.objects.create(
+            user=self.user, scope='upload', key='key-1', fingerprint='a' * 64,
+            locked_until=timezone.now() - timedelta(seconds=1), expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(self.run_key().status_code, 201)
+        self.assertEqual(self.calls, 1)
+
+    def test_keys_are_per_user(self):
+        self.run_key()
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        run_idempotent('upload', other.id, 'key-1', 'b' * 64, self.handler())
+        self.assertEqual(self.calls, 2)
+
+
+class TokenRevocationTests(TestCase):
+    """Logout and password changes revoke tokens through the stored token version."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('jwt', 'jwt@example.com', 'pw')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+        return client
+
+    def test_logout_revokes_tokens(self):
+        client = self.client_for(self.user)
+        self.assertEqual(client.get('/api/orders/').status_code, 200)
+        self.assertEqual(client.post('/api/logout/').status_code, 200)
+        self.assertEqual(client.get('/api/orders/').status_code, 401)
+        self.assertEqual(self.client_for(self.user).get('/api/orders/').status_code, 200)  # ✅ New login works
+
+    def test_password_change_revokes_tokens(self):
+        client = self.client_for(self.user)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(client.get('/api/orders/').status_code, 401)
+
+
+class StoreDirectoryVersionTests(TestCase):
+    """The store directory version comes from the database, so it only changes with the data."""
+
+    def setUp(self):
+        stores._forget()
+        self.user = User.objects.create_user('stores', 'stores@example.com', 'pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+
+    def test_version_is_shared_and_stable(self):
+        version = stores.current_version()
+        stores._forget()  # ✅ As another process would see it, or this one after STORE_VERSION_TTL
+        self.assertEqual(stores.current_version(), version)
+
+    def test_store_changes_bump_the_version(self):
+        version = stores.current_version()
+        store = Store.objects.create(name='Store', location='Campus', contact='000')
+        created = stores.current_version()
+        self.assertGreater(created, version)
+        stores._forget()
+        self.assertEqual(stores.current_version(), created)
+        store.delete()
+        self.assertGreater(stores.current_version(), created)
+
+    def test_listing_etag_only_changes_with_the_data(self):
+        Store.objects.create(name='Store', location='Campus', contact='000')
+        etag = self.client.get('/api/stores/')['ETag']
+        stores._forget()
+        self.assertEqual(self.client.get('/api/stores/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Store.objects.create(name='Other', location='Campus', contact='000')
+        response = self.client.get('/api/stores/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+
+class OrderRowSerializationTests(TestCase):
+    """The values()-based listing path must match PrintOrderSerializer field for field."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('rows', 'rows@example.com', 'pw')
+        store = Store.objects.create(
+            name='Store \u2028', location='Campus', contact='000', latitude=1e-05, longitude=77.5,
+        )
+        document = Document.objects.create(
+            sha256='0' * 64, size=1, num_pages=3, file_url='https://example.com/doc.pdf',
+        )
+        common = {'user': user, 'page_size': 'A4', 'print_type': 'black_white'}
+        PrintOrder.objects.create(store=store, document=document, file_path='https://example.com/stale.pdf', **common)
+        PrintOrder.objects.create(store=None, file_path='https://example.com/legacy.pdf', **common)
+        ArchivedPrintOrder.objects.bulk_create([
+            ArchivedPrintOrder(id=1000, store=store, document=document, uploaded_at=timezone.now(), **common),
+            ArchivedPrintOrder(id=1001, file_path='https://example.com/old.pdf', uploaded_at=timezone.now(), **common),
+        ])
+
+    def assert_matches_serializer(self, queryset):
+        queryset = queryset.order_by('id')
+        expected = PrintOrderSerializer(queryset.select_related('user', 'store', 'document'), many=True).data
+        rows = serialize_order_rows(order_values(queryset))
+        self.assertEqual(rows, [dict(order) for order in expected])
+        return rows
+
+    def test_hot_orders(self):
+        rows = self.assert_matches_serializer(PrintOrder.objects.all())
+        self.assertEqual(
+            [row['file_path'] for row in rows], ['https://example.com/doc.pdf', 'https://example.com/legacy.pdf'],
+        )
+        self.assertIsNone(rows[1]['store'])
+
+    def test_archived_orders(self):
+        rows = self.assert_matches_serializer(ArchivedPrintOrder.objects.all())
+        self.assertEqual(
+            [row['file_path'] for row in rows], ['https://example.com/doc.pdf', 'https://example.com/old.pdf'],
+        )
+
+    def test_rendered_json_is_equivalent(self):
+        rows = serialize_order_rows(order_values(PrintOrder.objects.order_by('id')))
+        fast = FastJSONRenderer().render(rows)
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(rows)))
+        self.assertNotIn('\u2028'.encode(), fast)
+
+
+# ✅ TransactionTestCase: documents are resolved on worker threads, which need to see committed rows
+class BulkUploadTests(TransactionTestCase):
+    """Bulk uploads validate their shared print settings and insert every order at once."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bulk', 'bulk@example.com', 'pw')
+        self.store = Store.objects.create(name='Bulk Store', location='Campus', contact='000')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        storage = override_settings(
+            PRINT_STORAGE_BACKEND='api.storage.LocalFileSystemStorage', LOCAL_STORAGE_ROOT=tempfile.mkdtemp(),
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def upload(self, **data):
+        files = [
+            SimpleUploadedFile(f'doc{i}.pdf', make_pdf(i + 1, salt=str(i)), content_type='application/pdf')
+            for i in range(3)
+        ]
+        return self.client.post('/api/upload/bulk/', {'files': files, 'store_id': self.store.id, **data})
+
+    def test_orders_are_inserted_together(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(num_copies=2)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 3)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "api_printorder"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(PrintOrder.objects.values_list('num_pages', 'num_copies')), [(1, 2), (2, 2), (3, 2)],
+        )
+        self.assertEqual(queue_snapshot(self.store.id)['pending_jobs'], 3)
+
+    def test_invalid_print_settings_are_rejected(self):
+        for data in ({'num_copies': 0}, {'num_copies': 'two'}, {'page_size': 'A0'}, {'print_type': 'sepia'}):
+            self.assertEqual(self.upload(**data).status_code, 400)
+        self.assertFalse(PrintOrder.objects.exists())
+
+
+class UploadFileTests(TestCase):
+    """Single uploads reject bad print settings with a 400 before doing any work, and time every stage."""
+
+    def setUp(self):
+        user = User.objects.create_user('single', 'single@example.com', 'pw')
+        self.store = Store.objects.create(name='Single Store', location='Campus', contact='000')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+    def test_upload_records_its_stages(self):
+        def count(stage):
+            return metrics.stage_duration._series.get((stage,), [0])[-1]
+
+        stages = (
+            'multipart_parse', 'store_lookup', 'hash', 'page_count', 'storage_upload', 'db_insert', 'serialization',
+        )
+        before = {stage: count(stage) for stage in stages}
+        with override_settings(
+            PRINT_STORAGE_BACKEND='api.storage.LocalFileSystemStorage', LOCAL_STORAGE_ROOT=tempfile.mkdtemp(),
+            PAGE_COUNT_WORKERS=0,
+        ):
+            response = self.client.post('/api/upload/', {
+                'file': SimpleUploadedFile('doc.pdf', make_pdf(1, salt='stages'), content_type='application/pdf'),
+                'store_id': self.store.id,
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual({stage: count(stage) - before[stage] for stage in stages}, dict.fromkeys(stages, 1))
+
+    def test_invalid_print_settings_are_rejected(self):
+        client, store = self.client, self.store
+        for data in ({'num_copies': 'two'}, {'num_copies': -1}, {'page_size': 'A0'}, {'print_type': 'sepia'}):
+            response = client.post('/api/upload/', {
+                'file': SimpleUploadedFile('doc.pdf', make_pdf(1), content_type='application/pdf'),
+                'store_id': store.id, **data,
+            }, HTTP_IDEMPOTENCY_KEY=f'key-{data}')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(PrintOrder.objects.exists())
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """replica_reads sends reads to a healthy replica unless the user just wrote something."""
+
+    def setUp(self):
+        routers._health.clear()
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].clear()
+        self.addCleanup(routers._health.clear)
+        self.router = routers.ReplicaRouter()
+        self.request = SimpleNamespace(user=SimpleNamespace(id=1, is_authenticated=True))
+
+    def read_alias(self, fail_on_replica=False):
+        """The database the router picks for reads inside a replica_reads view (None: the primary)."""
+        seen = []
+
+        @routers.replica_reads
+        def view(request):
+            alias = self.router.db_for_read(PrintOrder)
+            seen.append(alias)
+            if fail_on_replica and alias == 'replica':
+                raise DatabaseError('replica gone')
+            return Response()
+
+        view(self.request)
+        return seen
+
+    def test_reads_go_to_a_healthy_replica(self):
+        with mock.patch.object(routers, '_check', return_value=True):
+            self.assertEqual(self.read_alias(), ['replica'])
+        self.assertEqual(self.router.db_for_write(PrintOrder), 'default')
+        self.assertIsNone(self.router.db_for_read(PrintOrder))  # ✅ Outside the view: the primary
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        request = RequestFactory().post('/api/upload/')
+        request.user = self.request.user
+        ReplicaPinMiddleware(lambda request: Response(status=201))(request)
+        self.assertTrue(routers.is_pinned(1))
+        with mock.patch.object(routers, '_check', return_value=True):
+            self.assertEqual(self.read_alias(), [None])
+
+    def test_unhealthy_replicas_fall_back_to_the_primary(self):
+        with mock.patch.object(routers, '_check', return_value=False):
+            self.assertEqual(self.read_alias(), [None])
+        routers._health.clear()
+        with mock.patch.object(routers, '_check', return_value=True):
+            self.assertEqual(self.read_alias(fail_on_replica=True), ['replica', None])  # ✅ Re-run on the primary
+            self.assertEqual(self.read_alias(), [None])  # ✅ Marked unhealthy until the next check
+
+
+class UploadJobTests(TestCase):
+    """Unreadable files fail their order at once; storage and database errors are retried."""
+
+    def setUp(self):
+        user = User.objects.create_user('async', 'async@example.com', 'pw')
+        store = Store.objects.create(name='Async Store', location='Campus', contact='000')
+        self.order = PrintOrder.objects.create(user=user, store=store, file_name='doc', status='processing')
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        spool_path = f'{spool_dir.name}/doc.pdf'
+        open(spool_path, 'wb').close()
+        UploadJob.objects.create(order=self.order, spool_path=spool_path, original_name='doc.pdf')
+
+    def run_failing(self, error):
+        job = claim_job()
+        with mock.patch('api.jobs.resolve_document', side_effect=error):
+            self.assertFalse(run_job(job))
+        self.order.refresh_from_db()
+        return UploadJob.objects.filter(order=self.order).first()
+
+    def test_unreadable_file_fails_immediately(self):
+        self.assertIsNone(self.run_failing(PageCountError('encrypted')))
+        self.assertEqual(self.order.status, 'failed')
+
+    def test_storage_errors_are_retried_with_backoff(self):
+        job = self.run_failing(StorageError('timed out'))
+        self.assertEqual(self.order.status, 'processing')
+        self.assertEqual((job.attempts, job.last_error), (1, 'timed out'))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(claim_job())  # ✅ Not due again until the backoff passes
+
+
+class QueueClaimTests(TestCase):
+    """Agents get disjoint jobs, expired leases go back to the queue, and only the holder may renew/complete."""
+
+    def setUp(self):
+        user = User.objects.create_user('agent', 'agent@example.com', 'pw')
+        self.store = Store.objects.create(name='Agent Store', location='Campus', contact='000')
+        self.orders = [
+            PrintOrder.objects.create(user=user, store=self.store, file_name=f'doc{i}', status='pending')
+            for i in range(4)
+        ]
+
+    def claim(self, agent_id, limit=2):
+        orders, _ = claim_jobs(self.store.id, agent_id, limit, 60)
+        return [order.id for order in orders]
+
+    def expire(self, order_ids):
+        PrintOrder.objects.filter(id__in=order_ids).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claims_do_not_overlap(self):
+        first, second = self.claim('agent-1'), self.claim('agent-2')
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(self.claim('agent-3'), [])
+
+    def test_expired_lease_can_be_claimed_again(self):
+        held = self.claim('agent-1', limit=4)
+        self.expire(held[:1])
+        self.assertEqual(self.claim('agent-2', limit=4), held[:1])
+        self.assertEqual(PrintOrder.objects.get(id=held[0]).claimed_by, 'agent-2')
+
+    def test_only_the_current_holder_may_renew_or_complete(self):
+        held = self.claim('agent-1')
+        self.assertEqual(renew_lease(self.store.id, 'agent-2', held, 60)[0], [])
+        self.assertEqual(complete_jobs(self.store.id, 'agent-2', held), [])
+        self.assertEqual(sorted(renew_lease(self.store.id, 'agent-1', held, 60)[0]), sorted(held))
+
+        self.expire(held)
+        self.assertEqual(renew_lease(self.store.id, 'agent-1', held, 60)[0], [])
+        self.assertEqual(complete_jobs(self.store.id, 'agent-1', held), [])
+        self.assertEqual(set(PrintOrder.objects.filter(id__in=held).values_list('status', flat=True)), {'printing'})
+
+
+class OrderPaginationTests(TestCase):
+    """get_orders pages by keyset: stable under inserts, strict about cursors, and it ends."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('pages', 'pages@example.com', 'pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        for i in range(5):
+            self.create(f'doc{i}')
+        ArchivedPrintOrder.objects.create(
+            id=1, user=self.user, file_name='old', page_size='A4', print_type='black_white',
+            uploaded_at=timezone.now() - timedelta(days=365),
+        )
+
+    def create(self, name):
+        return PrintOrder.objects.create(user=self.user, file_name=name, page_size='A4', print_type='black_white')
+
+    def page(self, cursor=None):
+        params = {'limit': 2, **({'cursor': cursor} if cursor is not None else {})}
+        response = self.client.get('/api/orders/', params)
+        self.assertEqual(response.status_code, 200)
+        return [order['file_name'] for order in response.json()['results']], response.json()['next_cursor']
+
+    def test_pages_are_stable_and_reach_the_end(self):
+        names, cursor = self.page()
+        self.assertEqual(names, ['doc4', 'doc3'])
+        self.create('newer')  # ✅ Inserted between requests: must not shift later pages
+        seen = list(names)
+        while cursor is not None:
+            names, cursor = self.page(cursor)
+            seen += names
+        self.assertEqual(seen, ['doc4', 'doc3', 'doc2', 'doc1', 'doc0', 'old'])
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ('abc', '-5', '1.5', 'a-1', 'a1x', '1 OR 1=1'):
+            self.assertEqual(self.client.get('/api/orders/', {'cursor': cursor}).status_code, 400, cursor)
+        self.assertEqual(self.client.get('/api/orders/', {'limit': 0}).status_code, 400)
+
+
+class ResumableUploadTests(TestCase):
+    """Chunks must line up with the session; they may arrive in any order, twice, and finalize needs them all."""
+
+    def setUp(self):
+        user = User.objects.create_user('chunks', 'chunks@example.com', 'pw')
+        self.store = Store.objects.create(name='Chunk Store', location='Campus', contact='000')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+        settings_override = override_settings(
+            UPLOAD_SESSION_DIR=tempfile.mkdtemp(), UPLOAD_SESSION_MIN_CHUNK=1, PAGE_COUNT_WORKERS=0,
+            PRINT_STORAGE_BACKEND='api.storage.LocalFileSystemStorage', LOCAL_STORAGE_ROOT=tempfile.mkdtemp(),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.data = make_pdf(2)
+        self.chunk_size = len(self.data) // 3 + 1  # ✅ Three chunks, the last one short
+        response = self.client.post('/api/upload/sessions/', {
+            'file_name': 'doc.pdf', 'size': len(self.data), 'chunk_size': self.chunk_size, 'store_id': self.store.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/api/upload/sessions/{response.data['session_id']}/"
+
+    def put(self, offset, body=None, content_range=None):
+        body = self.data[offset:offset + self.chunk_size] if body is None else body
+        content_range = content_range or f'bytes {offset}-{offset + len(body) - 1}/{len(self.data)}'
+        return self.client.put(
+            self.url, body, content_type='application/octet-stream', HTTP_CONTENT_RANGE=content_range,
+        )
+
+    def finalize(self):
+        return self.client.post(f'{self.url}complete/')
+
+    def test_out_of_order_and_duplicate_chunks(self):
+        for offset in (2 * self.chunk_size, 0, 2 * self.chunk_size, self.chunk_size):
+            self.assertEqual(self.put(offset).status_code, 200)
+        response = self.finalize()
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(PrintOrder.objects.get(id=response.data['order_id']).num_pages, 2)
+        self.assertEqual(self.finalize().status_code, 409)  # ✅ Only finalized once
+
+    def test_misaligned_chunks_are_rejected(self):
+        size = len(self.data)
+        rejected = [
+            self.put(1),  # ✅ Not on a chunk boundary
+            self.put(0, body=self.data[:self.chunk_size - 1]),  # ✅ Short chunk that isn't the last
+            self.put(2 * self.chunk_size, body=self.data[2 * self.chunk_size:] + b'x'),  # ✅ Past the end
+            self.put(0, content_range=f'bytes 0-{self.chunk_size - 1}/{size + 1}'),  # ✅ Wrong total
+            self.put(0, content_range=f'bytes 0-{self.chunk_size}/{size}'),  # ✅ Range disagrees with the body
+            self.client.put(f'{self.url}?offset={size}', b'x', content_type='application/octet-stream'),
+            self.client.put(f'{self.url}?offset=-{self.chunk_size}', self.data[:self.chunk_size],
+                            content_type='application/octet-stream'),
+        ]
+        self.assertEqual([response.status_code for response in rejected], [400] * len(rejected))
+        self.assertEqual(self.client.get(self.url).data['received_bytes'], 0)
+
+    def test_finalize_needs_every_chunk(self):
+        self.put(0)
+        self.put(2 * self.chunk_size)
+        response = self.finalize()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing_offsets'], [self.chunk_size])
+        self.assertFalse(PrintOrder.objects.exists())
+        self.put(self.chunk_size)
+        self.assertEqual(self.finalize().status_code, 201)
+
+
+class RenditionTests(TestCase):
+    """An artifact cache too small for what it holds must not loop re-rendering evicted files."""
+
+    def setUp(self):
+        settings_override = override_settings(
+            ARTIFACT_CACHE_DIR=tempfile.mkdtemp(), ARTIFACT_CACHE_MAX_BYTES=1, RENDER_WORKERS=0,
+            PRINT_STORAGE_BACKEND='api.storage.LocalFileSystemStorage', LOCAL_STORAGE_ROOT=tempfile.mkdtemp(),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('render', 'render@example.com', 'pw')
+
+    def document(self, salt):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(make_pdf(1, salt=salt))
+            f.flush()
+            file_url, _ = get_storage().save(f.name, 'doc.pdf')
+        return Document.objects.create(sha256=salt * 64, size=1, num_pages=1, file_url=file_url, file_name='doc.pdf')
+
+    def test_thumbnail_is_served_even_if_the_cache_is_full(self):
+        path = ensure_thumbnail(self.document('a'))
+        self.assertTrue(os.path.exists(path))
+
+    def test_render_artifacts_gives_up_on_evicted_documents(self):
+        for salt in 'ab':
+            PrintOrder.objects.create(
+                user=self.user, document=self.document(salt), page_size='A4', print_type='black_white',
+            )
+        out = io.StringIO()
+        call_command('render_artifacts', '--once', '--backfill', stdout=out)  # ✅ Used to loop forever
+        self.assertIn('1 document(s) failed', out.getvalue())
+
+
+class ArchiveTests(TestCase):
+    """Only orders completed before the cutoff move to the archive, aged by when they completed."""
+
+    def test_orders_are_aged_by_completion(self):
+        user = User.objects.create_user('archive', 'archive@example.com', 'pw')
+        long_ago = timezone.now() - timedelta(days=200)
+
+        def order(name, status, completed_at=None):
+            order = PrintOrder.objects.create(
+                user=user, file_name=name, page_size='A4', print_type='black_white', status=status,
+            )
+            PrintOrder.objects.filter(id=order.id).update(uploaded_at=long_ago, completed_at=completed_at)
+            return order.id
+
+        old = order('old', 'completed', completed_at=long_ago)
+        legacy = order('legacy', 'completed')  # ✅ Completed before completed_at existed: aged by upload time
+        order('recent', 'completed', completed_at=timezone.now())
+        order('printing', 'printing')
+
+        self.assertEqual(archive_batch(archive_cutoff(90), 10), 2)
+        self.assertEqual(sorted(ArchivedPrintOrder.objects.values_list('id', flat=True)), sorted([old, legacy]))
+        self.assertEqual(ArchivedPrintOrder.objects.get(id=old).completed_at, long_ago)
+        self.assertEqual(sorted(PrintOrder.objects.values_list('file_name', flat=True)), ['printing', 'recent'])
+
+    def test_completion_is_stamped(self):
+        user = User.objects.create_user('stamp', 'stamp@example.com', 'pw')
+        order = PrintOrder.objects.create(user=user, file_name='doc', page_size='A4', print_type='black_white')
+        self.assertIsNone(order.completed_at)
+        order.status = 'completed'
+        order.save(update_fields=['status'])
+        self.assertIsNotNone(PrintOrder.objects.get(id=order.id).completed_at)
+
+
+class OrderEventTests(TestCase):
+    """Status changes reach stream subscribers once their transaction commits."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.user = User.objects.create_user('events', 'events@example.com', 'pw')
+        self.order = PrintOrder.objects.create(user=self.user, file_name='doc', num_pages=1, status='pending')
+
+    def subscribe(self, broker, channel):
+        async def subscribe():
+            return broker.subscribe(channel)
+
+        subscription = self.loop.run_until_complete(subscribe())
+        self.addCleanup(subscription.close)
+        return subscription
+
+    def next_event(self, subscription):
+        return self.loop.run_until_complete(subscription.get(timeout=5))
+
+    def test_committed_status_change_reaches_subscriber(self):
+        subscription = self.subscribe(get_broker(), f'user:{self.user.id}')
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders({self.order.id: 1}, 'printing', claimed_by='desk')
+            self.loop.run_until_complete(asyncio.sleep(0.1))
+            self.assertTrue(subscription.queue.empty())  # ✅ Nothing is sent before the commit
+
+        event = self.next_event(subscription)
+        self.assertEqual(
+            (event['order_id'], event['status'], event['previous_status']), (self.order.id, 'printing', 'pending'),
+        )
+
+    @skipUnless(settings.ORDER_EVENT_REDIS_URL, 'needs ORDER_EVENT_REDIS_URL')
+    def test_redis_broker_relays_between_processes(self):
+        web, worker = RedisBroker(), RedisBroker()  # ✅ Two brokers stand in for two processes
+        subscription = self.subscribe(web, f'user:{self.user.id}')
+        self.loop.run_until_complete(asyncio.sleep(0.5))  # ✅ Let the listener's SUBSCRIBE land
+        with mock.patch('api.events.get_broker', return_value=worker), self.captureOnCommitCallbacks(execute=True):
+            transition_orders({self.order.id: 1}, 'printing', claimed_by='desk')
+
+        self.assertEqual(self.next_event(subscription)['status'], 'printing')
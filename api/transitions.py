@@ -0,0 +1,114 @@
+"""Order status transitions with optimistic concurrency.
+
+Clients send the ``version`` they last saw for each order. All the orders
+that are still at that version, and in a status the state machine allows
+to move to the target, are changed by one conditional ``UPDATE`` that
+also bumps their version. Every other order is reported back as a
+conflict instead of silently overwriting someone else's change.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .events import order_event, publish_order_events
+from .models import PrintOrder
+from .queue_stats import record_status_change
+
+# ✅ Status -> statuses it may move to
+TRANSITIONS = {
+    'pending': ('printing',),
+    'printing': ('completed',),
+}
+# ✅ Paying completes an order straight from the queue; anything else (processing, failed...) can't be paid for
+PAYABLE_STATUSES = ('pending',)
+TARGET_STATUSES = sorted({status for targets in TRANSITIONS.values() for status in targets})
+
+
+def sources_for(status):
+    return [source for source, targets in TRANSITIONS.items() if status in targets]
+
+
+def _queue_fields(status, claimed_by):
+    """Lease columns for ``status``: printing jobs get a lease like agent claims, so they are re-queued if abandoned."""
+    if status == 'printing':
+        return {'claimed_by': claimed_by, 'lease_expires_at': timezone.now() + timedelta(seconds=settings.QUEUE_LEASE_SECONDS)}
+    if status == 'completed':
+        return {'lease_expires_at': None, 'completed_at': timezone.now()}
+    return {'lease_expires_at': None}
+
+
+def transition_orders(versions, status, claimed_by=''):
+    """Move orders to ``status``; ``versions`` maps order id -> expected version.
+
+    Orders moved to ``printing`` are held by ``claimed_by`` for
+    ``QUEUE_LEASE_SECONDS``, exactly as if that agent had claimed them.
+    Returns one result per requested id, in request order: ``updated``
+    (with the new version), ``conflict`` (version moved on),
+    ``invalid_transition`` or ``not_found``.
+    """
+    sources = sources_for(status)
+    with transaction.atomic():
+        # ✅ Locked in id order, so overlapping bulk requests can't deadlock
+        current = {
+            order.id: order for order in PrintOrder.objects.select_for_update().filter(id__in=versions)
+            .only('id', 'user_id', 'store_id', 'status', 'version', 'num_pages', 'num_copies').order_by('id')
+        }
+        results, applied = {}, []
+        for order_id, version in versions.items():
+            order = current.get(order_id)
+            if order is None:
+                results[order_id] = {'id': order_id, 'result': 'not_found'}
+            elif order.version != version:
+                results[order_id] = {'id': order_id, 'result': 'conflict', 'status': order.status, 'version': order.version}
+            elif order.status not in sources:
+                results[order_id] = {
+                    'id': order_id, 'result': 'invalid_transition', 'status': order.status, 'version': order.version,
+                }
+            else:
+                applied.append(order)
+
+        if applied:
+            matches = Q()
+            for order in applied:
+                matches |= Q(id=order.id, version=order.version)
+            PrintOrder.objects.filter(matches, status__in=sources).update(
+                status=status, version=F('version') + 1, **_queue_fields(status, claimed_by),
+            )
+            previous = {order.id: order.status for order in applied}
+            publish_order_events(
+                order_event(order.id, order.user_id, order.store_id, status, order.status) for order in applied
+            )
+            record_status_change(applied, status, previous)
+
+    for order in applied:
+        results[order.id] = {'id': order.id, 'result': 'updated', 'status': status, 'version': order.version + 1}
+    return [results[order_id] for order_id in versions]
+
+
+def complete_payment(order_id, user_id):
+    """Mark a user's pending order completed with a conditional update.
+
+    Returns ``(result, status)`` with ``result`` one of ``updated``,
+    ``unchanged`` (already completed), ``invalid_transition`` (the order is
+    in any other status, e.g. still processing or failed) or ``not_found``.
+    """
+    with transaction.atomic():
+        order = (
+            PrintOrder.objects.select_for_update().filter(id=order_id, user_id=user_id)
+            .only('id', 'user_id', 'store_id', 'status', 'version', 'num_pages', 'num_copies').first()
+        )
+        if order is None:
+            return 'not_found', None
+        if order.status == 'completed':
+            return 'unchanged', order.status
+        if order.status not in PAYABLE_STATUSES:
+            return 'invalid_transition', order.status
+        PrintOrder.objects.filter(id=order.id, version=order.version).update(
+            status='completed', version=F('version') + 1, lease_expires_at=None, completed_at=timezone.now(),
+        )
+        publish_order_events([order_event(order.id, order.user_id, order.store_id, 'completed', order.status)])
+        record_status_change([order], 'completed', order.status)
+    return 'updated', 'completed'
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.db import connections
+
+from .metrics import stage
+from .models import Document
+from .pagecount import PageCountError, count_pages  # noqa: F401  (PageCountError re-exported)
+from .storage import get_storage
+
+# Size of the buffer used when copying an upload to disk
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Size of the buffer used when hashing a file
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+class StorageError(Exception):
+    """The storage backend did not accept the document."""
+
+
+class ArchiveError(Exception):
+    """A bulk-upload archive is unreadable or over its limits."""
+
+
+def _copy_chunks(file, path):
+    with open(path, 'wb') as out:
+        for chunk in file.chunks(COPY_BUFFER_SIZE):
+            out.write(chunk)
+
+
+@contextmanager
+def spooled_upload(file):
+    """Yield a path on disk holding the uploaded bytes.
+
+    Uploads that Django already streamed to a temporary file are used in
+    place; anything else is copied to a temp file chunk by chunk, so the
+    whole document is never held in memory.
+    """
+    if hasattr(file, 'temporary_file_path'):
+        yield file.temporary_file_path()
+        return
+
+    suffix = os.path.splitext(file.name)[1]
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix=suffix)
+    os.close(fd)
+    try:
+        _copy_chunks(file, path)
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def save_to_spool(path, file_name):
+    """Move a spooled upload into ``UPLOAD_SPOOL_DIR`` so a worker can pick it up later."""
+    spool_dir = str(settings.UPLOAD_SPOOL_DIR)
+    os.makedirs(spool_dir, exist_ok=True)
+    spool_path = os.path.join(spool_dir, f"{uuid.uuid4().hex}{os.path.splitext(file_name)[1]}")
+    file_move_safe(path, spool_path)
+    return spool_path
+
+
+def hash_file(path):
+    """Stream a file through SHA-256 and return ``(hexdigest, size)``."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def store_file(path, file_name):
+    """Stream a file to the configured storage backend.
+
+    Returns ``(file_url, stored_name)``.
+    """
+    return get_storage().save(path, file_name)
+
+
+def resolve_document(path, file_name, digest=None, size=None):
+    """Return the :class:`Document` for the bytes at ``path``.
+
+    Known content is returned straight from the index; otherwise pages are
+    counted, the file is stored once and a new index entry is written.
+    Raises :class:`PageCountError` or :class:`StorageError`.
+    """
+    if digest is None:
+        digest, size = hash_file(path)
+    elif size is None:
+        size = os.path.getsize(path)
+
+    document = Document.objects.filter(sha256=digest).first()
+    if document:
+        return document
+
+    with stage('page_count'):
+        page_count = count_pages(path, file_name, digest)
+
+    try:
+        with stage('storage_upload'):
+            file_url, stored_name = store_file(path, file_name)
+    except Exception as e:
+        raise StorageError(str(e)) from e
+    if not file_url:
+        raise StorageError("No file URL returned")
+
+    # ✅ Another request may have stored the same bytes meanwhile; keep the first
+    document, _ = Document.objects.get_or_create(sha256=digest, defaults={
+        'file_name': stored_name,
+        'file_url': file_url,
+        'num_pages': page_count,
+        'size': size,
+    })
+    return document
+
+
+def extract_archive(archive, dest_dir, max_files, max_bytes):
+    """Stream the files of a ZIP archive into ``dest_dir``.
+
+    Returns a list of ``(path, file_name)``. Directories, dotfiles and
+    macOS resource forks are skipped; member names are flattened to their
+    basename so nothing escapes ``dest_dir``.
+    """
+    items = []
+    total = 0
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                file_name = os.path.basename(info.filename)
+                if info.is_dir() or not file_name or file_name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                    continue
+                if len(items) >= max_files:
+                    raise ArchiveError(f"Archive has more than {max_files} files")
+                total += info.file_size
+                if total > max_bytes:
+                    raise ArchiveError(f"Archive expands to more than {max_bytes} bytes")
+
+                path = os.path.join(dest_dir, f"{len(items)}-{file_name}")
+                with zf.open(info) as src, open(path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+                items.append((path, file_name))
+    except (zipfile.BadZipFile, zipfile.LargeZipFile) as e:
+        raise ArchiveError(f"Invalid archive: {e}") from e
+    return items
+
+
+def _in_worker_thread(func, *args):
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()  # ✅ Don't leak one DB connection per pool thread
+
+
+def resolve_documents(items, max_workers):
+    """Resolve many ``(path, file_name)`` items concurrently on a bounded thread pool.
+
+    Files are hashed first so identical files in the same batch are counted
+    and stored only once. Returns, in input order, a :class:`Document` or
+    the exception raised for each item.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        hashes = list(pool.map(hash_file, [path for path, _ in items]))
+
+        first_by_digest = {}
+        for index, (digest, _) in enumerate(hashes):
+            first_by_digest.setdefault(digest, index)
+
+        futures = {
+            digest: pool.submit(_in_worker_thread, resolve_document, *items[index], *hashes[index])
+            for digest, index in first_by_digest.items()
+        }
+
+    results = []
+    for digest, _ in hashes:
+        try:
+            results.append(futures[digest].result())
+        except Exception as e:
+            results.append(e)
+    return results
@@ -1,12 +1,36 @@
 from django.urls import path
-from .views import home, register, login, upload_file 
+from .views import home, register, login, logout, upload_file 
 from .views import get_orders,get_stores 
+from .views import export_orders, bulk_transition, update_payment_status
+from .views import bulk_upload, revenue_report
+from .views import get_nearest_stores, store_queue, claim_queue_jobs, renew_queue_jobs, complete_queue_jobs
+from .views import order_print_file, order_thumbnail
+from .views import create_upload_session, upload_session, finalize_upload_session
+from .streams import order_events, store_events
 
 urlpatterns = [
     path('', home, name='home'),  # ✅ Home route
     path('register/', register, name='register'),
     path('login/', login, name='login'),
+    path('logout/', logout, name='logout'),
      path('orders/', get_orders, name='get_orders'),
+    path('orders/export/', export_orders, name='export_orders'),
+    path('orders/transitions/', bulk_transition, name='transition_orders'),
+    path('orders/payment/', update_payment_status, name='update_payment_status'),
+    path('orders/<int:order_id>/print-file/', order_print_file, name='order_print_file'),
+    path('orders/<int:order_id>/thumbnail/', order_thumbnail, name='order_thumbnail'),
       path('upload/', upload_file, name='upload_file'),
+    path('upload/bulk/', bulk_upload, name='bulk_upload'),
+    path('upload/sessions/', create_upload_session, name='create_upload_session'),  # ✅ Resumable uploads
+    path('upload/sessions/<uuid:session_id>/', upload_session, name='upload_session'),
+    path('upload/sessions/<uuid:session_id>/complete/', finalize_upload_session, name='finalize_upload_session'),
      path('stores/', get_stores, name='get_stores'),
+    path('stores/nearest/', get_nearest_stores, name='nearest_stores'),
+    path('stores/<int:store_id>/queue/', store_queue, name='store_queue'),
+    path('stores/<int:store_id>/queue/claim/', claim_queue_jobs, name='claim_queue_jobs'),
+    path('stores/<int:store_id>/queue/renew/', renew_queue_jobs, name='renew_queue_jobs'),
+    path('stores/<int:store_id>/queue/complete/', complete_queue_jobs, name='complete_queue_jobs'),
+    path('reports/revenue/', revenue_report, name='revenue_report'),
+    path('events/orders/', order_events, name='order_events'),  # ✅ Server-Sent Events
+    path('events/stores/<int:store_id>/', store_events, name='store_events'),
 ]
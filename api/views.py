@@ -1,26 +1,67 @@
+import logging
+import os
+import tempfile
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
 from django.shortcuts import render
+from django.views.decorators.http import condition
 from django.contrib.auth.models import User
-from django.http import JsonResponse
-import fitz  # PyMuPDF for reading PDFs
-from io import BytesIO
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 
-from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 
-from .models import PrintOrder, Store
-from .serializers import PrintOrderSerializer, StoreSerializer
+from .models import (
+    PAGE_SIZE_CHOICES, PRINT_TYPE_CHOICES, ArchivedPrintOrder, Document, PrintOrder, Store, UploadJob, UploadSession,
+)
+from .exports import FORMATS as EXPORT_FORMATS, stream_export
+from .filters import filter_orders, includes_archived
+from . import metrics
+from .metrics import stage
+from .pagination import keyset_paginate, paginated_payload
+from .routers import replica_reads
+from .resumable import (
+    ChunkError, begin_finalize, create_session, discard_part, parse_range, part_path, progress as upload_progress,
+    write_chunk,
+)
+from .renditions import ACTIVE_STATUSES, RenditionError, ensure_thumbnail, get_artifact_cache, print_key
+from .queue import claim_jobs, complete_jobs, group_jobs, renew_lease
+from .geo import ranked_stores
+from .queue_stats import queue_snapshot, queue_snapshots, record_status_change
+from .serializers import PrintOrderSerializer, order_values, serialize_order_rows
+from .renderers import FastJSONRenderer
+from .transitions import TARGET_STATUSES, complete_payment, transition_orders
+from .stores import get_store, listing_etag, listing_last_modified, store_listing, wants_queue
+from .auth import revoke_user_tokens, tokens_for_user
+from .events import publish_status_change
+from .idempotency import fingerprint, run_idempotent
+from .uploads import (
+    ArchiveError, PageCountError, StorageError, extract_archive, hash_file, resolve_document,
+    resolve_documents, save_to_spool, spooled_upload,
+)
 
-import cloudinary.uploader  # ✅ Cloudinary for file storage
+logger = logging.getLogger(__name__)
 
 # ✅ Home Route
 def home(request):
     return JsonResponse({"message": "Welcome to Web2Print API!"})
 
+# ✅ Prometheus Metrics (text exposition format; set METRICS_TOKEN to require a bearer token)
+def metrics_endpoint(request):
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # ✅ User Registration API
 @api_view(['POST'])
 def register(request):
@@ -40,155 +81,696 @@ def login(request):
     email = request.data.get('email')
     password = request.data.get('password')
 
-    try:
-        user = User.objects.get(email=email)
-        user = authenticate(username=user.username, password=password)
-        if user:
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': {'id': user.id, 'username': user.username, 'email': user.email}
-            })
-    except User.DoesNotExist:
-        pass
+    # ✅ One indexed lookup by email (api.auth.EmailBackend)
+    user = authenticate(request, email=email, password=password)
+    if user:
+        refresh = tokens_for_user(user)
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'user': {'id': user.id, 'username': user.username, 'email': user.email}
+        })
 
     return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
+def _order_from_file(user_id, store, path, original_name, page_size, num_copies, print_type, file_hash=None):
+    """Create the print order for an uploaded file on disk and build the API response.
+
+    Shared by ``upload_file`` and finalized resumable uploads: known content
+    reuses its document, new content is queued (``UPLOAD_ASYNC``) or
+    page-counted and stored right away. ``file_hash`` is ``hash_file(path)``
+    when the caller already has it.
+    """
+    file_name = os.path.splitext(original_name)[0]
+    if file_hash is None:
+        with stage('hash'):
+            file_hash = hash_file(path)
+    digest, size = file_hash
+    document = Document.objects.filter(sha256=digest).first()
+    if document:
+        logger.info("Reusing stored document %s for %s", digest[:12], original_name)
+
+    # ✅ Async mode: park the file for a worker and answer right away
+    elif settings.UPLOAD_ASYNC:
+        spool_path = save_to_spool(path, original_name)
+        try:
+            with transaction.atomic():
+                print_order = PrintOrder.objects.create(
+                    user_id=user_id,
+                    store=store,
+                    file_name=file_name,
+                    page_size=page_size,
+                    num_copies=num_copies,
+                    print_type=print_type,
+                    status="processing"
+                )
+                UploadJob.objects.create(
+                    order=print_order,
+                    spool_path=spool_path,
+                    original_name=original_name,
+                    sha256=digest,
+                )
+        except Exception as e:
+            os.unlink(spool_path)
+            logger.exception("Could not queue order")
+            return Response({'error': f'Could not save order: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        logger.info("Print order #%s queued for processing", print_order.id)
+        with stage('serialization'):
+            data = {
+                'message': 'File accepted for processing',
+                'order_id': print_order.id,
+                'status': print_order.status,
+                'file_name': print_order.file_name,
+                'page_size': print_order.page_size,
+                'num_copies': print_order.num_copies,
+                'print_type': print_order.print_type,
+                'store': store.name,
+            }
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+    # ✅ New document: count pages (file-backed) and stream it to storage
+    else:
+        try:
+            document = resolve_document(path, original_name, digest, size)
+        except PageCountError as e:
+            logger.warning("Failed to count pages of %s: %s", original_name, e)
+            return Response({'error': f'Failed to process PDF: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        except StorageError as e:
+            logger.error("Storage upload of %s failed: %s", original_name, e)
+            return Response({'error': f'Cloud upload failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # ✅ Save Print Order (points at the shared document)
+    try:
+        with stage('db_insert'):
+            print_order = PrintOrder.objects.create(
+                user_id=user_id,
+                store=store,
+                document=document,
+                file_name=file_name,
+                page_size=page_size,
+                num_copies=num_copies,
+                print_type=print_type,
+                num_pages=document.num_pages,
+                status="pending"
+            )
+        logger.info("Print order #%s created for store %s", print_order.id, store.name)
+    except Exception as e:
+        logger.exception("Could not save order")
+        return Response({'error': f'Could not save order: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    with stage('serialization'):
+        data = {
+            'message': 'File uploaded successfully',
+            'order_id': print_order.id,
+            'file_name': print_order.file_name,
+            'page_size': print_order.page_size,
+            'num_copies': print_order.num_copies,
+            'print_type': print_order.print_type,
+            'num_pages': print_order.num_pages,
+            'store': print_order.store.name,
+            'file_url': document.file_url  # ✅ Added URL for frontend access
+        }
+    return Response(data, status=status.HTTP_201_CREATED)
+
+# ✅ Logout (revokes every token the user holds, on all devices)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    revoke_user_tokens(request.user.id)
+    return Response({'message': 'Logged out'}, status=status.HTTP_200_OK)
+
+# ✅ Print settings shared by the upload endpoints: (page_size, num_copies, print_type), or None if invalid
+def _print_settings(data):
+    try:
+        num_copies = int(data.get('num_copies', 1))
+    except (TypeError, ValueError):
+        return None
+    page_size = data.get('page_size', 'A4')
+    print_type = data.get('print_type', 'black_white')
+    if num_copies < 1 or page_size not in dict(PAGE_SIZE_CHOICES) or print_type not in dict(PRINT_TYPE_CHOICES):
+        return None
+    return page_size, num_copies, print_type
+
 # ✅ Upload File API (Uses Cloudinary)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
 def upload_file(request):
-    print("✅ Received Upload Request")
-    
     try:
         # ✅ Check for Authorization token
         token = request.headers.get('Authorization')
         if not token:
-            print("❌ Missing authentication token!")
             return Response({'error': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        # ✅ Check if a file is uploaded
-        if 'file' not in request.FILES:
-            print("❌ No file uploaded!")
+        # ✅ Check if a file is uploaded (first access parses the multipart body)
+        with stage('multipart_parse'):
+            files = request.FILES
+        if 'file' not in files:
             return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
 
-        file = request.FILES['file']
-        print(f"📂 File Received: {file.name}")
+        file = files['file']
 
-        page_size = request.data.get('page_size', 'A4')
-        num_copies = int(request.data.get('num_copies', 1))
-        print_type = request.data.get('print_type', 'black_white')
+        # ✅ Validated before anything is hashed, stored or queued
+        print_settings = _print_settings(request.data)
+        if print_settings is None:
+            return Response({'error': 'Invalid print settings'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size, num_copies, print_type = print_settings
         store_id = request.data.get('store_id')
 
         user = request.user
-        print(f"👤 User: {user}")
 
         # ✅ Validate Store Selection
         if not store_id:
-            print("❌ No store selected!")
             return Response({'error': 'Please select a store'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            store = Store.objects.get(id=store_id)
+            with stage('store_lookup'):
+                store = get_store(store_id)  # ✅ Served from the store cache
         except Store.DoesNotExist:
-            print("❌ Selected store does not exist!")
             return Response({'error': 'Selected store does not exist'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # ✅ Process PDF Page Count
-        page_count = 1
-        if file.name.lower().endswith('.pdf'):
-            try:
-                pdf_file = BytesIO(file.read())  # ✅ Use BytesIO before uploading to Cloudinary
-                with fitz.open(stream=pdf_file, filetype="pdf") as pdf:
-                    page_count = pdf.page_count
-                file.seek(0)  # ✅ Reset file pointer for Cloudinary upload
-                print(f"📄 PDF has {page_count} pages")
-            except Exception as e:
-                print(f"❌ Failed to process PDF: {str(e)}")
-                return Response({'error': f'Failed to process PDF: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # ✅ Upload to Cloudinary
-        try:
-            cloudinary_response = cloudinary.uploader.upload(file)
-            file_url = cloudinary_response.get('secure_url')
-            file_name = cloudinary_response.get('original_filename')
+        # ✅ Spool to disk once, then the same path as a finalized resumable upload
+        with spooled_upload(file) as path:
+            idempotency_key = request.headers.get('Idempotency-Key')
+            if idempotency_key is None:
+                return _order_from_file(user.id, store, path, file.name, page_size, num_copies, print_type)
 
-            if not file_url:
-                print("❌ Cloudinary upload failed! No file URL returned.")
-                return Response({'error': 'Cloudinary upload failed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            # ✅ Retries with the same key replay the first response: no page count, storage upload or new order
+            with stage('hash'):
+                file_hash = hash_file(path)
+            request_fingerprint = fingerprint(*file_hash, file.name, page_size, num_copies, print_type, store.id)
+            return run_idempotent('upload', user.id, idempotency_key, request_fingerprint, lambda: _order_from_file(
+                user.id, store, path, file.name, page_size, num_copies, print_type, file_hash=file_hash,
+            ))
 
-            print(f"✅ File uploaded to Cloudinary: {file_url}")
-        except Exception as e:
-            print(f"❌ Cloudinary Error: {str(e)}")
-            return Response({'error': f'Cloud upload failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except Exception as e:
+        logger.exception("Unexpected error in upload_file")
+        return Response({'error': f'Unexpected error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # ✅ Save Print Order
-        try:
-            print_order = PrintOrder.objects.create(
-                user=user,
-                store=store,
-                file_name=file_name,
-                file_path=file_url,
-                page_size=page_size,
-                num_copies=num_copies,
-                print_type=print_type,
-                num_pages=page_count,
-                status="pending"
-            )
-            print(f"✅ Print Order Created for Store: {store.name}", print_order)
-        except Exception as e:
-            print(f"❌ Could not save order: {str(e)}")
-            return Response({'error': f'Could not save order: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+# ✅ Resumable Uploads: open a session, PUT chunks (any order, in parallel), finalize
+def _upload_session(request, session_id):
+    return UploadSession.objects.select_related('store').filter(id=session_id, user_id=request.user.id).first()
 
-        return Response({
-            'message': 'File uploaded successfully',
-            'order_id': print_order.id,
-            'file_name': print_order.file_name,
-            'page_size': print_order.page_size,
-            'num_copies': print_order.num_copies,
-            'print_type': print_order.print_type,
-            'num_pages': print_order.num_pages,
-            'store': print_order.store.name,
-            'file_url': file_url  # ✅ Added URL for frontend access
-        }, status=status.HTTP_201_CREATED)
-    
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload_session(request):
+    try:
+        size = int(request.data.get('size'))
+        chunk_size = int(request.data.get('chunk_size') or settings.UPLOAD_SESSION_CHUNK_SIZE)
+        num_copies = int(request.data.get('num_copies', 1))
+    except (TypeError, ValueError):
+        return Response({'error': 'size, chunk_size and num_copies must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    file_name = os.path.basename(request.data.get('file_name') or '')
+    page_size = request.data.get('page_size', 'A4')
+    print_type = request.data.get('print_type', 'black_white')
+
+    if not file_name:
+        return Response({'error': 'file_name is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 < size <= settings.UPLOAD_SESSION_MAX_BYTES:
+        return Response({'error': f'size must be between 1 and {settings.UPLOAD_SESSION_MAX_BYTES} bytes'}, status=status.HTTP_400_BAD_REQUEST)
+    if not settings.UPLOAD_SESSION_MIN_CHUNK <= chunk_size <= settings.UPLOAD_SESSION_MAX_CHUNK:
+        return Response({'error': f'chunk_size must be between {settings.UPLOAD_SESSION_MIN_CHUNK} and {settings.UPLOAD_SESSION_MAX_CHUNK} bytes'}, status=status.HTTP_400_BAD_REQUEST)
+    if num_copies < 1 or page_size not in dict(PAGE_SIZE_CHOICES) or print_type not in dict(PRINT_TYPE_CHOICES):
+        return Response({'error': 'Invalid print settings'}, status=status.HTTP_400_BAD_REQUEST)
+
+    store_id = request.data.get('store_id')
+    if not store_id:
+        return Response({'error': 'Please select a store'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        store = get_store(store_id)
+    except Store.DoesNotExist:
+        return Response({'error': 'Selected store does not exist'}, status=status.HTTP_400_BAD_REQUEST)
+
+    session = create_session(
+        user_id=request.user.id,
+        store=store,
+        file_name=file_name,
+        size=size,
+        chunk_size=chunk_size,
+        page_size=page_size,
+        num_copies=num_copies,
+        print_type=print_type,
+    )
+    return Response(upload_progress(session), status=status.HTTP_201_CREATED)
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def upload_session(request, session_id):
+    session = _upload_session(request, session_id)
+    if session is None:
+        return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        return Response(upload_progress(session))
+
+    if session.status != 'open':
+        return Response({'error': f'Upload session is {session.status}'}, status=status.HTTP_409_CONFLICT)
+    try:
+        content_length = int(request.headers['Content-Length']) if request.headers.get('Content-Length') else None
+        offset, length = parse_range(
+            request.headers.get('Content-Range'), request.query_params.get('offset'), content_length, session.size,
+        )
+        with stage('chunk_write'):
+            write_chunk(session, offset, length, request.stream)  # ✅ Raw body, never parsed or buffered
+    except (ChunkError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(upload_progress(session))
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_upload_session(request, session_id):
+    session = _upload_session(request, session_id)
+    if session is None:
+        return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    state = upload_progress(session)
+    if session.status != 'open':
+        return Response({'error': f'Upload session is {session.status}', 'order_id': session.order_id}, status=status.HTTP_409_CONFLICT)
+    if state['missing_offsets']:
+        return Response({'error': 'Upload is incomplete', 'missing_offsets': state['missing_offsets']}, status=status.HTTP_400_BAD_REQUEST)
+    if not begin_finalize(session):
+        return Response({'error': 'Upload session is already being finalized'}, status=status.HTTP_409_CONFLICT)
+
+    try:
+        response = _order_from_file(
+            request.user.id, session.store, part_path(session), session.file_name,
+            session.page_size, session.num_copies, session.print_type,
+        )
     except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
-        return Response({'error': f'Unexpected error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logger.exception("Unexpected error finalizing upload %s", session.id)
+        response = Response({'error': f'Unexpected error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if response.status_code in (status.HTTP_201_CREATED, status.HTTP_202_ACCEPTED):
+        session.order_id = response.data['order_id']
+        session.status = 'completed'
+        session.save(update_fields=['order', 'status'])
+        discard_part(session)  # ✅ Already moved to the spool in async mode
+    else:
+        UploadSession.objects.filter(id=session.id).update(status='open')  # ✅ Let the client retry
+    return response
 
-# ✅ Fetch Print Orders (Authenticated Users)
+# ✅ Fetch Print Orders (Authenticated Users, keyset-paginated on -id)
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def get_orders(request):
     user = request.user
 
-    if user.is_staff:  # ✅ Admin gets all orders
-        orders = PrintOrder.objects.all().order_by('-id')
-    else:  # ✅ Regular user gets only their own orders
-        orders = PrintOrder.objects.filter(user=user).order_by('-id')
+    # ✅ User, store and document columns joined into flat values() rows (no N+1, no model instances)
+    orders = PrintOrder.objects.all()
+    if not user.is_staff:  # ✅ Regular user gets only their own orders, admin gets all
+        orders = orders.filter(user_id=user.id)
+    orders = order_values(filter_orders(orders, request.query_params))
+
+    # ✅ Old completed orders live in the archive; only read once the hot rows run out
+    archive = None
+    if includes_archived(request.query_params):
+        archive = ArchivedPrintOrder.objects.all()
+        if not user.is_staff:
+            archive = archive.filter(user_id=user.id)
+        archive = order_values(filter_orders(archive, request.query_params))
+
+    with stage('db_fetch'):
+        page, next_cursor = keyset_paginate(orders, request, archive)
+    with stage('serialization'):
+        data = serialize_order_rows(page)  # ✅ Same schema as PrintOrderSerializer
+    return Response(paginated_payload(request, data, next_cursor))
 
-    serializer = PrintOrderSerializer(orders, many=True)
-    return Response(serializer.data)
+# ✅ Export Orders as CSV / NDJSON (staff; streamed in constant memory, same filters as get_orders)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@replica_reads
+def export_orders(request):
+    export_format = request.query_params.get('fmt', 'csv')  # ✅ Not ?format=, DRF reserves it
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f"fmt must be one of {', '.join(sorted(EXPORT_FORMATS))}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    querysets = [filter_orders(PrintOrder.objects.all(), request.query_params)]
+    if includes_archived(request.query_params):
+        querysets.insert(0, filter_orders(ArchivedPrintOrder.objects.all(), request.query_params))  # ✅ Oldest first
+    response = StreamingHttpResponse(stream_export(querysets, export_format), content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="orders-{timezone.now():%Y%m%dT%H%M%S}.{export_format}"'
+    return response
 
-# ✅ Fetch Available Stores
+# ✅ Fetch Available Stores (cached; answers 304 when the client's copy is current)
+@condition(etag_func=listing_etag, last_modified_func=listing_last_modified)
 @api_view(['GET'])
+@replica_reads
 def get_stores(request):
-    stores = Store.objects.all()
-    serializer = StoreSerializer(stores, many=True)
-    return Response(serializer.data)
+    listing = store_listing()
+    if wants_queue(request):
+        # ✅ Counters change constantly, so they're merged in per request rather than cached with the listing
+        snapshots = queue_snapshots()
+        listing = [{**store, 'queue': snapshots.get(store['id'])} for store in listing]
+    return Response(listing)
+
+# ✅ Nearest Stores (k-d tree over store coordinates, ranked by distance + queue load)
+@api_view(['GET'])
+@replica_reads
+def get_nearest_stores(request):
+    params = request.query_params
+    try:
+        lat, lng = float(params['lat']), float(params['lng'])
+        k = int(params.get('k', 5))
+        radius_km = float(params['radius_km']) if params.get('radius_km') else None
+    except (KeyError, ValueError):
+        return Response({'error': 'lat and lng are required numbers; k and radius_km must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return Response({'error': 'lat must be within ±90 and lng within ±180'}, status=status.HTTP_400_BAD_REQUEST)
+    if k < 1 or (radius_km is not None and radius_km <= 0):
+        return Response({'error': 'k and radius_km must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(ranked_stores(lat, lng, min(k, settings.NEAREST_STORES_MAX_K), radius_km))
+
+# ✅ Store queue depth and estimated wait (one lookup on the counter row)
+@api_view(['GET'])
+@replica_reads
+def store_queue(request, store_id):
+    snapshot = queue_snapshot(store_id)
+    if snapshot is None:
+        return Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(snapshot)
 
 # ✅ Update Payment Status (Mark as "Completed")
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_payment_status(request):
     order_id = request.data.get('order_id')
+    if not str(order_id).isdigit():
+        return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    try:
-        order = PrintOrder.objects.get(id=order_id, user=request.user)
-        order.status = "completed"
-        order.save()
-        return Response({"message": "Payment successful, order marked as completed!"}, status=status.HTTP_200_OK)
-    except PrintOrder.DoesNotExist:
+    # ✅ Conditional UPDATE of status/version only; no read-modify-save of the whole row
+    result, order_status = complete_payment(int(order_id), request.user.id)
+    if result == 'not_found':
         return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+    if result == 'invalid_transition':
+        return Response(
+            {"error": f"Only pending orders can be paid for (order is {order_status})", "status": order_status},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response({"message": "Payment successful, order marked as completed!"}, status=status.HTTP_200_OK)
+
+# ✅ Bulk Status Transitions (staff; pending -> printing -> completed, checked against each order's version)
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_transition(request):
+    target = request.data.get('status')
+    if target not in TARGET_STATUSES:
+        return Response({'error': f"status must be one of {', '.join(TARGET_STATUSES)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    orders = request.data.get('orders')
+    if not isinstance(orders, list) or not orders:
+        return Response({'error': 'orders must be a non-empty list of {"id", "version"}'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(orders) > settings.BULK_TRANSITION_MAX_ORDERS:
+        return Response({'error': f'At most {settings.BULK_TRANSITION_MAX_ORDERS} orders per request'}, status=status.HTTP_400_BAD_REQUEST)
+    versions = {}
+    for order in orders:
+        if not isinstance(order, dict) or not all(str(order.get(key, '')).isdigit() for key in ('id', 'version')):
+            return Response({'error': 'Each order needs an integer id and version'}, status=status.HTTP_400_BAD_REQUEST)
+        versions[int(order['id'])] = int(order['version'])
+
+    # ✅ Jobs moved to printing are held like an agent claim (re-queued when the lease runs out)
+    agent_id = str(request.data.get('agent_id') or f'staff:{request.user.id}').strip()[:100]
+    results = transition_orders(versions, target, claimed_by=agent_id)
+    updated = sum(result['result'] == 'updated' for result in results)
+    return Response({'status': target, 'updated': updated, 'failed': len(results) - updated, 'results': results})
+
+# ✅ Store Print Queue: claim, renew and complete jobs (store print agents)
+def _queue_request(request, store_id):
+    """Validate the store and the ``agent_id``/``order_ids`` body shared by queue endpoints."""
+    try:
+        get_store(store_id)
+    except Store.DoesNotExist:
+        return None, Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    agent_id = str(request.data.get('agent_id', '')).strip()
+    if not agent_id:
+        return None, Response({'error': 'agent_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    return agent_id, None
+
+
+def _order_ids(request):
+    order_ids = request.data.get('order_ids') or []
+    if not isinstance(order_ids, list) or not all(str(i).isdigit() for i in order_ids):
+        return None
+    return [int(i) for i in order_ids]
+
+
+def _lease_seconds(request):
+    try:
+        lease = int(request.data.get('lease_seconds', settings.QUEUE_LEASE_SECONDS))
+    except (TypeError, ValueError):
+        return None
+    return min(max(lease, 1), settings.QUEUE_MAX_LEASE_SECONDS)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def claim_queue_jobs(request, store_id):
+    agent_id, error = _queue_request(request, store_id)
+    if error:
+        return error
+
+    lease_seconds = _lease_seconds(request)
+    try:
+        limit = int(request.data.get('limit', 10))
+    except (TypeError, ValueError):
+        limit = None
+    if lease_seconds is None or limit is None or limit < 1:
+        return Response({'error': 'limit and lease_seconds must be positive integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    orders, lease_expires_at = claim_jobs(store_id, agent_id, min(limit, settings.QUEUE_MAX_CLAIM), lease_seconds)
+    return Response({
+        'agent_id': agent_id,
+        'lease_expires_at': lease_expires_at,
+        'claimed': len(orders),
+        'groups': [
+            {
+                'page_size': group['page_size'],
+                'print_type': group['print_type'],
+                'orders': PrintOrderSerializer(group['orders'], many=True).data,
+            }
+            for group in group_jobs(orders)
+        ],
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def renew_queue_jobs(request, store_id):
+    agent_id, error = _queue_request(request, store_id)
+    if error:
+        return error
+
+    order_ids = _order_ids(request)
+    lease_seconds = _lease_seconds(request)
+    if order_ids is None or lease_seconds is None:
+        return Response({'error': 'order_ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+    renewed, lease_expires_at = renew_lease(store_id, agent_id, order_ids, lease_seconds)
+    return Response({
+        'renewed': renewed,
+        'lost': sorted(set(order_ids) - set(renewed)),  # ✅ Expired and re-claimed by another agent
+        'lease_expires_at': lease_expires_at,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def complete_queue_jobs(request, store_id):
+    agent_id, error = _queue_request(request, store_id)
+    if error:
+        return error
+
+    order_ids = _order_ids(request)
+    if order_ids is None:
+        return Response({'error': 'order_ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+    completed = complete_jobs(store_id, agent_id, order_ids)
+    return Response({'completed': completed, 'not_held': sorted(set(order_ids) - set(completed))})
+
+# ✅ Print-ready file for a queued order (store print agents; rendered by `render_artifacts`)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def order_print_file(request, order_id):
+    order = PrintOrder.objects.select_related('document').filter(id=order_id).first()
+    if order is None:
+        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    if order.status not in ACTIVE_STATUSES:
+        return Response({'error': f'Order is {order.status}, not in the print queue'}, status=status.HTTP_409_CONFLICT)
+
+    path = None
+    if order.document_id:
+        path = get_artifact_cache().get(print_key(order.document.sha256, order.page_size, order.print_type))
+    if path is None:
+        # ✅ Not rendered yet; the pipeline picks up every pending/printing order
+        return Response({'status': 'rendering'}, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': '5'})
+
+    file_name = f"{order.id}-{os.path.splitext(order.file_name)[0]}-{order.page_size}-{order.print_type}.pdf"
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=file_name, content_type='application/pdf')
+
+# ✅ First-page Preview (owner or staff; cached by document hash, rendered on a miss)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_thumbnail(request, order_id):
+    orders = PrintOrder.objects.select_related('document').filter(id=order_id)
+    if not request.user.is_staff:
+        orders = orders.filter(user_id=request.user.id)
+    order = orders.first()
+    if order is None:
+        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not order.document_id:
+        return Response({'status': 'processing'}, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': '5'})
+
+    etag = f'"{order.document.sha256}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    try:
+        with stage('thumbnail'):
+            path = ensure_thumbnail(order.document)
+    except RenditionError as e:
+        logger.warning("No thumbnail for order %s: %s", order.id, e)
+        return Response({'error': 'No preview available for this file'}, status=status.HTTP_404_NOT_FOUND)
+
+    response = FileResponse(open(path, 'rb'), content_type='image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=86400'  # ✅ Content-addressed, never changes
+    return response
+
+# ✅ Bulk Upload API: many files (or one ZIP) with shared print settings
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def bulk_upload(request):
+    files = request.FILES.getlist('files')
+    archive = request.FILES.get('archive')
+    if not files and not archive:
+        return Response({'error': 'No files uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(files) > settings.BULK_UPLOAD_MAX_FILES:
+        return Response({'error': f'At most {settings.BULK_UPLOAD_MAX_FILES} files per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    print_settings = _print_settings(request.data)
+    if print_settings is None:
+        return Response({'error': 'Invalid print settings'}, status=status.HTTP_400_BAD_REQUEST)
+    page_size, num_copies, print_type = print_settings
+
+    store_id = request.data.get('store_id')
+    if not store_id:
+        return Response({'error': 'Please select a store'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        store = get_store(store_id)
+    except Store.DoesNotExist:
+        return Response({'error': 'Selected store does not exist'}, status=status.HTTP_400_BAD_REQUEST)
+
+    with ExitStack() as stack:
+        # ✅ Spool everything to disk (uploaded files in place, archive members into a temp dir)
+        items = [(stack.enter_context(spooled_upload(f)), f.name) for f in files]
+        if archive:
+            extract_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='bulk-'))
+            try:
+                items += extract_archive(
+                    archive, extract_dir,
+                    settings.BULK_UPLOAD_MAX_FILES - len(items), settings.BULK_UPLOAD_MAX_BYTES,
+                )
+            except ArchiveError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not items:
+            return Response({'error': 'Archive contains no files'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # ✅ Page counts and storage uploads run concurrently on a bounded pool
+        documents = resolve_documents(items, settings.BULK_UPLOAD_WORKERS)
+
+    results = []
+    new_orders = []
+    for (_, name), document in zip(items, documents):
+        if isinstance(document, Exception):
+            results.append({'file_name': name, 'status': 'error', 'error': str(document)})
+            continue
+        results.append({'file_name': name, 'status': 'created'})
+        new_orders.append(PrintOrder(
+            user_id=request.user.id,
+            store=store,
+            document=document,
+            file_name=os.path.splitext(name)[0],
+            page_size=page_size,
+            num_copies=num_copies,
+            print_type=print_type,
+            num_pages=document.num_pages,
+            status="pending",
+        ))
+
+    # ✅ One multi-row INSERT for every order in the request
+    with transaction.atomic():
+        created = PrintOrder.objects.bulk_create(new_orders)
+        publish_status_change(created, 'pending')
+        record_status_change(created, 'pending')
+
+    created_iter = iter(created)
+    for result in results:
+        if result['status'] == 'created':
+            order = next(created_iter)
+            result.update({
+                'order_id': order.id,
+                'num_pages': order.num_pages,
+                'file_url': order.file_url,
+            })
+
+    return Response({
+        'store': store.name,
+        'created': len(created),
+        'failed': len(results) - len(created),
+        'results': results,
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+# ✅ Revenue & Page Volume Report (one GROUP BY query, staff only)
+REPORT_BUCKETS = {'hour', 'day', 'week', 'month', 'year'}
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@replica_reads
+def revenue_report(request):
+    bucket = request.query_params.get('bucket', 'day')
+    if bucket not in REPORT_BUCKETS:
+        return Response({'error': f"bucket must be one of {', '.join(sorted(REPORT_BUCKETS))}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    def grouped(orders):
+        return (
+            filter_orders(orders, request.query_params).with_cost()
+            .annotate(period=Trunc('uploaded_at', bucket))
+            .values('period', 'store_id', 'store__name')
+            .annotate(
+                orders=Count('id'),
+                pages=Sum(F('num_pages') * F('num_copies')),
+                revenue=Sum('cost'),
+            )
+        )
+
+    # ✅ One GROUP BY per tier; archived (completed) orders still count, merged per period and store
+    totals = {}
+    tiers = [PrintOrder.objects.exclude(status__in=['processing', 'failed'])]
+    if includes_archived(request.query_params):
+        tiers.append(ArchivedPrintOrder.objects.all())
+    for orders in tiers:
+        for row in grouped(orders):
+            key = (row['period'], row['store_id'])
+            if key in totals:
+                for field in ('orders', 'pages', 'revenue'):
+                    totals[key][field] = (totals[key][field] or 0) + (row[field] or 0)
+            else:
+                totals[key] = row
+    rows = [totals[key] for key in sorted(totals, key=lambda key: (key[0], key[1] or 0))]
+    return Response({
+        'bucket': bucket,
+        'results': [
+            {
+                'period': row['period'],
+                'store_id': row['store_id'],
+                'store': row['store__name'],
+                'orders': row['orders'],
+                'pages': row['pages'],
+                'revenue': row['revenue'],
+            }
+            for row in rows
+        ],
+    })
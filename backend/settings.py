@@ -3,6 +3,7 @@ import os
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
+from corsheaders.defaults import default_headers
 
 # Base Directory
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,12 +35,20 @@ INSTALLED_APPS = [
 # ✅ Django REST Framework Config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.auth.CachedJWTAuthentication',  # ✅ User built from token claims, no per-request user query
     ),
 }
 
+# ✅ Login by email in one indexed query; ModelBackend kept for the admin
+AUTHENTICATION_BACKENDS = [
+    'api.auth.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # ✅ Middleware
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',  # ✅ First, so it times the whole stack
+    'api.middleware.ReplicaPinMiddleware',  # ✅ Read-your-writes after POST/PUT/...
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +61,8 @@ MIDDLEWARE = [
 
 # ✅ CORS Settings (Allow frontend requests)
 CORS_ALLOW_ALL_ORIGINS = True  # ⚠️ Allow all origins (Adjust for production!)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')  # ✅ Browser clients can retry uploads safely
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 # ✅ URL Configuration
 ROOT_URLCONF = 'backend.urls'
@@ -87,6 +98,36 @@ DATABASES = {
     }
 }
 
+# ✅ DJANGO_DB=sqlite runs against the local db.sqlite3 (benchmarks, quick local runs)
+if os.getenv("DJANGO_DB", "postgres") == "sqlite":
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv("SQLITE_PATH", str(BASE_DIR / "db.sqlite3")),
+    }
+
+# ✅ Read replicas: POSTGRES_REPLICA_HOSTS="host[:port],..." (same credentials as the primary);
+# with DJANGO_DB=sqlite, SQLITE_REPLICA_PATH adds a second alias for trying the routing locally
+DATABASE_REPLICAS = []
+if os.getenv("DJANGO_DB", "postgres") == "sqlite":
+    if os.getenv("SQLITE_REPLICA_PATH"):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_REPLICA_PATH"),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append('replica')
+else:
+    for number, replica in enumerate(filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(',')), start=1):
+        host, _, port = replica.strip().partition(':')
+        DATABASES[f'replica{number}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            'TEST': {'MIRROR': 'default'},  # ✅ Tests read the primary's test database
+        }
+        DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
 # ✅ Password Validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -116,3 +157,145 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 # ✅ Default Primary Key Field Type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# ✅ Stream multipart uploads straight to a temp file instead of memory
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# ✅ Chunk size used when streaming uploads to storage (Cloudinary needs >= 5 MB)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 6 * 1024 * 1024))
+
+# ✅ Storage backend for uploaded documents ('api.storage.LocalFileSystemStorage' for tests/benchmarks)
+PRINT_STORAGE_BACKEND = os.getenv("PRINT_STORAGE_BACKEND", "api.storage.CloudinaryStorage")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", str(BASE_DIR / "media" / "uploads"))
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/media/uploads/")
+
+# ✅ Async upload mode: accept the file, answer 202 and let `manage.py process_uploads` finish it
+UPLOAD_ASYNC = os.getenv("UPLOAD_ASYNC", "False") == "True"
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", str(BASE_DIR / "spool"))
+UPLOAD_JOB_MAX_ATTEMPTS = int(os.getenv("UPLOAD_JOB_MAX_ATTEMPTS", 5))
+UPLOAD_JOB_RETRY_DELAY = int(os.getenv("UPLOAD_JOB_RETRY_DELAY", 10))  # seconds, doubled per attempt
+UPLOAD_JOB_LEASE = int(os.getenv("UPLOAD_JOB_LEASE", 300))  # seconds a claimed job stays hidden
+
+# ✅ Order listing page size (clients may ask for up to ORDERS_MAX_PAGE_SIZE with ?limit=)
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", 50))
+ORDERS_MAX_PAGE_SIZE = int(os.getenv("ORDERS_MAX_PAGE_SIZE", 200))
+
+# ✅ Caches: per-process memory by default, plus a shared Redis tier when REDIS_URL is set
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if os.getenv("REDIS_URL"):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv("REDIS_URL"),
+    }
+
+# ✅ Store directory cache (in-process LRU + optional shared tier)
+STORE_CACHE_ALIAS = 'shared' if 'shared' in CACHES else None
+STORE_CACHE_SIZE = int(os.getenv("STORE_CACHE_SIZE", 512))
+STORE_CACHE_TTL = int(os.getenv("STORE_CACHE_TTL", 300))  # seconds
+STORE_VERSION_TTL = int(os.getenv("STORE_VERSION_TTL", 5))  # seconds a process trusts its copy of the version
+
+# ✅ Store print queue: claim batch size and lease length for print agents
+QUEUE_MAX_CLAIM = int(os.getenv("QUEUE_MAX_CLAIM", 50))
+QUEUE_LEASE_SECONDS = int(os.getenv("QUEUE_LEASE_SECONDS", 300))
+QUEUE_MAX_LEASE_SECONDS = int(os.getenv("QUEUE_MAX_LEASE_SECONDS", 3600))
+
+# ✅ Nearest stores: how many of the closest stores are re-ranked by load, and how many
+# km of extra distance each queued page is worth (0.05 -> 100 pages counts as 5 km)
+NEAREST_STORES_CANDIDATES = int(os.getenv("NEAREST_STORES_CANDIDATES", 20))
+NEAREST_STORES_KM_PER_PAGE = float(os.getenv("NEAREST_STORES_KM_PER_PAGE", 0.05))
+NEAREST_STORES_MAX_K = int(os.getenv("NEAREST_STORES_MAX_K", 50))
+
+# ✅ Bulk status transitions: orders per request
+BULK_TRANSITION_MAX_ORDERS = int(os.getenv("BULK_TRANSITION_MAX_ORDERS", 500))
+
+# ✅ Live order events (Server-Sent Events over ASGI: `uvicorn backend.asgi:application`)
+ASGI_APPLICATION = 'backend.asgi.application'
+# ✅ Events from other processes (process_uploads, other workers) only reach streams through Redis
+ORDER_EVENT_REDIS_URL = os.getenv("ORDER_EVENT_REDIS_URL", os.getenv("REDIS_URL"))
+ORDER_EVENT_BROKER = os.getenv(
+    "ORDER_EVENT_BROKER", "api.events.RedisBroker" if ORDER_EVENT_REDIS_URL else "api.events.InProcessBroker",
+)
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 100))  # buffered events per client
+EVENT_HEARTBEAT_SECONDS = int(os.getenv("EVENT_HEARTBEAT_SECONDS", 15))
+EVENT_RETRY_MS = int(os.getenv("EVENT_RETRY_MS", 3000))  # client reconnect delay
+
+# ✅ Bulk uploads: files per request, max expanded archive size and worker threads
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", 100))
+BULK_UPLOAD_MAX_BYTES = int(os.getenv("BULK_UPLOAD_MAX_BYTES", 1024 * 1024 * 1024))
+BULK_UPLOAD_WORKERS = int(os.getenv("BULK_UPLOAD_WORKERS", 4))
+
+# ✅ Seconds the in-memory price table is trusted before re-reading PriceRule
+PRICE_CACHE_TTL = int(os.getenv("PRICE_CACHE_TTL", 60))
+
+# ✅ /metrics endpoint (optional bearer token) and structured app logging
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': os.getenv("API_LOG_LEVEL", "INFO")},
+    },
+}
+
+# ✅ JWT auth user cache (active/staff flags + revocations)
+AUTH_CACHE_ALIAS = 'shared' if 'shared' in CACHES else 'default'
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 60))  # seconds
+
+# ✅ Idempotency-Key on upload_file (records in the database): how long responses are replayable,
+# how long an in-flight claim lives if its worker dies, and how long a concurrent duplicate waits
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))  # seconds
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 300))
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 30))
+IDEMPOTENCY_POLL_INTERVAL = float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", 0.2))  # seconds
+
+# ✅ Page counting worker pool (0 workers = count inline in the request process)
+PAGE_COUNT_WORKERS = int(os.getenv("PAGE_COUNT_WORKERS", 2))
+PAGE_COUNT_TIMEOUT = int(os.getenv("PAGE_COUNT_TIMEOUT", 20))  # seconds per document
+PAGE_COUNT_MEMORY_LIMIT_MB = int(os.getenv("PAGE_COUNT_MEMORY_LIMIT_MB", 1024))  # per worker, 0 = unlimited
+PAGE_COUNTERS = {}  # e.g. {".odt": "myapp.counters.count_odt"}; see api.pagecount.COUNTERS
+
+# ✅ Print-ready renditions + thumbnails (python manage.py render_artifacts)
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", str(BASE_DIR / "artifacts"))
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 2))  # 0 = render inline
+RENDER_TIMEOUT = int(os.getenv("RENDER_TIMEOUT", 120))  # seconds per document
+RENDER_MEMORY_LIMIT_MB = int(os.getenv("RENDER_MEMORY_LIMIT_MB", 2048))
+RENDER_BATCH_SIZE = int(os.getenv("RENDER_BATCH_SIZE", 100))  # new documents per pipeline pass
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", 320))  # pixels
+STORAGE_FETCH_TIMEOUT = int(os.getenv("STORAGE_FETCH_TIMEOUT", 60))  # seconds
+
+# ✅ Resumable chunked uploads
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", str(BASE_DIR / "spool" / "sessions"))
+UPLOAD_SESSION_CHUNK_SIZE = int(os.getenv("UPLOAD_SESSION_CHUNK_SIZE", 8 * 1024 * 1024))  # default when the client doesn't pick one
+UPLOAD_SESSION_MIN_CHUNK = int(os.getenv("UPLOAD_SESSION_MIN_CHUNK", 256 * 1024))
+UPLOAD_SESSION_MAX_CHUNK = int(os.getenv("UPLOAD_SESSION_MAX_CHUNK", 64 * 1024 * 1024))
+UPLOAD_SESSION_MAX_BYTES = int(os.getenv("UPLOAD_SESSION_MAX_BYTES", 2 * 1024 ** 3))
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))  # seconds since the last chunk
+
+# ✅ Streaming order export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 2000))  # rows fetched per round trip
+EXPORT_LINES_PER_CHUNK = int(os.getenv("EXPORT_LINES_PER_CHUNK", 500))  # rows per write to the client
+
+# ✅ Hot/cold split: python manage.py archive_orders
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 90))  # completed orders older than this move out
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+
+# ✅ Replica routing (DATABASE_REPLICAS above)
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))  # primary-only window after a user's write
+# ✅ Pins must be visible to every worker: without REDIS_URL they stay per-process (fine for local runs; warned at startup)
+REPLICA_PIN_CACHE_ALIAS = 'shared' if 'shared' in CACHES else 'default'
+REPLICA_HEALTH_CHECK_INTERVAL = int(os.getenv("REPLICA_HEALTH_CHECK_INTERVAL", 10))  # seconds
+REPLICA_MAX_LAG_SECONDS = int(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponseRedirect
+from api.views import metrics_endpoint
 
 def redirect_to_api(request):
     return HttpResponseRedirect('/api/')
@@ -9,6 +10,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', redirect_to_api),  # ✅ Redirects `/` to `/api/`
     path('api/', include('api.urls')),
+    path('metrics', metrics_endpoint, name='metrics'),  # ✅ Prometheus scrape target
   
 
 ]